@@ -0,0 +1,218 @@
+"""
+Translate sound string encoded Trunic text without the GUI.
+
+Input is read line by line, each whitespace separated token is the sound
+string of one word, as produced by Word.getSoundStr().
+Known words are replaced by their translation, unknown words are kept as
+their sound string and reported.
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from typing import (Callable, Deque, Dict, Iterable, Iterator, List, TextIO,
+                    Tuple, TypeVar)
+
+from glyphs import Word, wordFromStr, SoundStrError
+from word_db import WordDB, WordDBError, DEFAULT_DB_PATH, upgradeDB
+
+# (sound string, translation or None if unknown, error message or None)
+TranslatedWord = Tuple[str, str | None, str | None]
+# line number and its words
+TranslatedLine = Tuple[int, List[TranslatedWord]]
+Chunk = List[Tuple[int, str]]
+
+DEFAULT_CHUNK_WORDS = 5000
+
+# Per process DB connection, opened by _initWorker
+_db: WordDB | None = None
+
+
+def _initWorker(dbPath: str):
+    global _db
+    _db = WordDB(dbPath, readOnly=True)
+
+
+def _parseToken(token: str) -> Tuple[Word | None, str | None]:
+    try:
+        return wordFromStr(token), None
+    except SoundStrError as err:
+        return None, str(err)
+
+
+def translateChunk(chunk: Chunk) -> List[TranslatedLine]:
+    """
+    Translate a chunk of (line number, line) pairs using this process's DB,
+    resolving all of its words together
+    """
+    assert _db is not None, "worker DB not initialized"
+    parsed = [(lineNum, [(t, *_parseToken(t)) for t in line.split()])
+              for lineNum, line in chunk]
+    _db.resolveWords(word for _, tokens in parsed for _, word, _ in tokens
+                     if word is not None)
+
+    out: List[TranslatedLine] = []
+    for lineNum, tokens in parsed:
+        line: List[TranslatedWord] = []
+        for token, word, error in tokens:
+            if word is None or len(word.value) == 0:
+                line.append((token, None, error))
+            else:
+                line.append((token, word.value, None))
+        out.append((lineNum, line))
+    return out
+
+
+def readChunks(stream: TextIO, chunkWords: int) -> Iterator[Chunk]:
+    """
+    Group input lines into chunks of roughly chunkWords words
+    """
+    chunk: Chunk = []
+    words = 0
+    for lineNum, line in enumerate(stream, 1):
+        chunk.append((lineNum, line))
+        words += len(line.split())
+        if words >= chunkWords:
+            yield chunk
+            chunk = []
+            words = 0
+    if len(chunk) > 0:
+        yield chunk
+
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def orderedMap(executor: Executor, func: Callable[[T], R], items: Iterable[T],
+               window: int) -> Iterator[R]:
+    """
+    Like executor.map(), but only keeps window items in flight
+    so the input is consumed lazily
+    """
+    inFlight: Deque[Future] = deque()
+    for item in items:
+        inFlight.append(executor.submit(func, item))
+        if len(inFlight) >= window:
+            yield inFlight.popleft().result()
+    while len(inFlight) > 0:
+        yield inFlight.popleft().result()
+
+
+def translateStream(stream: TextIO,
+                    dbPath: str = DEFAULT_DB_PATH,
+                    workers: int = 1,
+                    chunkWords: int = DEFAULT_CHUNK_WORDS
+                    ) -> Iterator[TranslatedLine]:
+    """
+    Translate every line of stream, in order.
+    With more than one worker, chunks are translated in a process pool,
+    each process holding its own read only DB connection
+    """
+    chunks = readChunks(stream, chunkWords)
+    if workers <= 1:
+        _initWorker(dbPath)
+        for chunk in chunks:
+            yield from translateChunk(chunk)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers,
+                             initializer=_initWorker,
+                             initargs=(dbPath, )) as pool:
+        for lines in orderedMap(pool, translateChunk, chunks, workers * 2):
+            yield from lines
+
+
+def writeText(out: TextIO, line: List[TranslatedWord]):
+    out.write(" ".join(value if value is not None else sounds
+                       for sounds, value, _ in line))
+    out.write("\n")
+
+
+def writeJSONL(out: TextIO, lineNum: int, line: List[TranslatedWord]):
+    words = []
+    for sounds, value, error in line:
+        entry = {"sounds": sounds, "value": value}
+        if error is not None:
+            entry["error"] = error
+        words.append(entry)
+    json.dump({"line": lineNum, "words": words}, out)
+    out.write("\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("input",
+                        nargs="?",
+                        default="-",
+                        help="input file, defaults to stdin")
+    parser.add_argument("-o",
+                        "--output",
+                        default="-",
+                        help="output file, defaults to stdout")
+    parser.add_argument("-f",
+                        "--format",
+                        choices=["text", "jsonl"],
+                        default="text")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, help="word DB path")
+    parser.add_argument("-j",
+                        "--workers",
+                        type=int,
+                        default=os.cpu_count() or 1,
+                        help="number of worker processes")
+    parser.add_argument("--chunk-size",
+                        type=int,
+                        default=DEFAULT_CHUNK_WORDS,
+                        help="words per chunk sent to a worker")
+    args = parser.parse_args()
+
+    # migrate an old DB once here, workers only open it read only
+    try:
+        upgradeDB(args.db)
+    except (WordDBError, sqlite3.Error) as err:
+        print(f"{args.db}: {err}", file=sys.stderr)
+        sys.exit(1)
+
+    inFile = sys.stdin if args.input == "-" else open(
+        args.input, encoding="utf-8")
+    outFile = sys.stdout if args.output == "-" else open(
+        args.output, "w", encoding="utf-8")
+
+    # sound string -> count
+    unknown: Dict[str, int] = {}
+    invalid: Dict[str, str] = {}
+    total = 0
+
+    try:
+        for lineNum, line in translateStream(inFile, args.db, args.workers,
+                                             args.chunk_size):
+            if args.format == "jsonl":
+                writeJSONL(outFile, lineNum, line)
+            else:
+                writeText(outFile, line)
+
+            for sounds, value, error in line:
+                total += 1
+                if error is not None:
+                    invalid[sounds] = error
+                elif value is None:
+                    unknown[sounds] = unknown.get(sounds, 0) + 1
+    finally:
+        if inFile is not sys.stdin:
+            inFile.close()
+        if outFile is not sys.stdout:
+            outFile.close()
+
+    print(f"{total} words, {len(unknown)} unknown, {len(invalid)} invalid",
+          file=sys.stderr)
+    for sounds, count in sorted(unknown.items(), key=lambda x: -x[1]):
+        print(f"unknown: {sounds} ({count})", file=sys.stderr)
+    for sounds, error in invalid.items():
+        print(f"invalid: {sounds}: {error}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,400 @@
+"""
+Microbenchmarks for the glyph codec, renderer and WordDB.
+
+Runs headless. Results are written as JSON, and can be compared against a
+previous run to fail on regressions:
+
+    python bench.py -o before.json
+    python bench.py --compare before.json --threshold 0.2
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Tuple
+
+from glyphs import (Glyph, Word, NUM_CODES, isValidCode, glyphFromStr,
+                    wordFromStr, SoundStrError)
+from word_db import WordDB
+
+DEFAULT_DB_SIZES = [1000, 100000, 1000000]
+# target run time of one timed repeat
+REPEAT_TIME = 0.2
+REPEATS = 5
+
+# name -> (setup, returns (func, ops per call) or None to skip)
+Benchmark = Callable[[], Tuple[Callable[[], None], int] | None]
+
+VALID_CODES = [c for c in range(NUM_CODES) if isValidCode(c)]
+
+
+def _roundTrips(code: int) -> bool:
+    try:
+        return glyphFromStr(Glyph.fromCode(code).getSoundStr()).code == code
+    except SoundStrError:
+        return False
+
+
+# The text codec can't represent every code (e.g. a lone dot),
+# only use the ones it round trips for codec and DB benchmarks
+TEXT_CODES = [c for c in VALID_CODES if _roundTrips(c)]
+
+
+def timeit(func: Callable[[], None], ops: int) -> Dict[str, float]:
+    """
+    Time func, which performs ops operations per call.
+    Returns ns per op as the min and median of several repeats
+    """
+    # calibrate loop count to roughly REPEAT_TIME
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= REPEAT_TIME / 10 or loops >= 1 << 20:
+            break
+        loops *= 2
+    loops = max(1, int(loops * (REPEAT_TIME / 10) / max(elapsed, 1e-9)) * 10)
+
+    samples = []
+    for _ in range(REPEATS):
+        start = time.perf_counter_ns()
+        for _ in range(loops):
+            func()
+        samples.append((time.perf_counter_ns() - start) / (loops * ops))
+
+    samples.sort()
+    return {
+        "ns_per_op": samples[0],
+        "median_ns_per_op": samples[len(samples) // 2],
+        "ops": loops * ops,
+    }
+
+
+def randomWord(rand: random.Random, minLen: int = 1, maxLen: int = 6) -> Word:
+    return Word.fromCodes(
+        rand.choice(TEXT_CODES)
+        for _ in range(rand.randint(minLen, maxLen)))
+
+
+# --- codec ---
+
+
+def benchGlyphSoundStr():
+    glyphs = [Glyph.fromCode(c) for c in VALID_CODES]
+
+    def run():
+        for g in glyphs:
+            g.getSoundStr()
+
+    return run, len(glyphs)
+
+
+def benchWordSoundStr():
+    rand = random.Random(0)
+    words = [randomWord(rand) for _ in range(1000)]
+
+    def run():
+        for w in words:
+            w.getSoundStr()
+
+    return run, len(words)
+
+
+def benchGlyphFromStr():
+    strs = [Glyph.fromCode(c).getSoundStr() for c in TEXT_CODES]
+
+    def run():
+        for s in strs:
+            glyphFromStr(s)
+
+    return run, len(strs)
+
+
+def benchWordFromStr():
+    rand = random.Random(0)
+    strs = [randomWord(rand).getSoundStr() for _ in range(1000)]
+
+    def run():
+        for s in strs:
+            wordFromStr(s)
+
+    return run, len(strs)
+
+
+# --- renderer ---
+
+
+class RecordingDrawList:
+    """
+    Stand in for im.ImDrawList that stores every draw call
+    """
+
+    def __init__(self) -> None:
+        self.calls: List[tuple] = []
+
+    def AddLine(self, p1, p2, col, thickness=1.0):
+        self.calls.append(("line", p1, p2, col, thickness))
+
+    def AddCircle(self, center, radius, col, num_segments=0, thickness=1.0):
+        self.calls.append(("circle", center, radius, col, thickness))
+
+    def AddImage(self, tex, pMin, pMax, uvMin, uvMax, col):
+        self.calls.append(("image", tex, pMin, pMax, uvMin, uvMax, col))
+
+    def clear(self):
+        self.calls.clear()
+
+
+def _renderBench(wordline: bool, atlas: bool = False):
+    try:
+        import imgui as im
+        import glyph_render
+    except ImportError:
+        return None
+    if atlas and not glyph_render.atlasAvailable():
+        return None
+
+    glyphs = [Glyph.fromCode(c) for c in VALID_CODES]
+    dl = RecordingDrawList()
+    pos = im.Vec2(10, 10)
+
+    glyph_render.useAtlas = atlas
+    if atlas:
+        # rasterize everything up front, with stand in textures
+        for g in glyphs:
+            glyph_render.renderGlyph(dl, g, pos, wordline)
+        for a in glyph_render._atlases.values():
+            a.upload(lambda data, w, h: object(), lambda tex: None)
+
+    def run():
+        dl.clear()
+        for g in glyphs:
+            glyph_render.renderGlyph(dl, g, pos, wordline)
+
+    return run, len(glyphs)
+
+
+def benchRender():
+    return _renderBench(False)
+
+
+def benchRenderWordLine():
+    return _renderBench(True)
+
+
+def benchRenderAtlas():
+    return _renderBench(True, atlas=True)
+
+
+def benchAtlasRasterize():
+    try:
+        from glyph_atlas import GlyphAtlas
+    except ImportError:
+        return None
+
+    def run():
+        GlyphAtlas(1.0).rasterizeAll()
+
+    return run, 2 * len(VALID_CODES)
+
+
+# --- WordDB ---
+
+
+def makeDB(path: str, size: int) -> List[Word]:
+    """
+    Fill a new DB with size random words, returns a sample of them
+    """
+    rand = random.Random(size)
+    words: Dict[bytes, Word] = {}
+    while len(words) < size:
+        w = randomWord(rand, 1, 8)
+        if w.getKey() in words:
+            continue
+        w.value = f"word{len(words)}"
+        words[w.getKey()] = w
+
+    with WordDB(path, flushDelay=None) as db:
+        db.storeWords(words.values())
+
+    sample = rand.sample(list(words.values()), min(1000, size))
+    return [w.copy() for w in sample]
+
+
+def dbBenchmarks(tmpDir: str, sizes: List[int]) -> Dict[str, Benchmark]:
+    out: Dict[str, Benchmark] = {}
+    for size in sizes:
+        path = os.path.join(tmpDir, f"words_{size}.db")
+        state = {}
+
+        def setup(path=path, size=size, state=state):
+            if "sample" not in state:
+                state["sample"] = makeDB(path, size)
+            return state["sample"]
+
+        def getUncached(path=path, setup=setup):
+            sample = setup()
+            db = WordDB(path, cacheSize=0)
+            words = [w.copy() for w in sample]
+
+            def run():
+                for w in words:
+                    db.getWord(w)
+
+            return run, len(words)
+
+        def resolveUncached(path=path, setup=setup):
+            sample = setup()
+            db = WordDB(path, cacheSize=0)
+            words = [w.copy() for w in sample]
+
+            def run():
+                db.resolveWords(words)
+
+            return run, len(words)
+
+        def getPreloaded(path=path, setup=setup):
+            sample = setup()
+            db = WordDB(path, preload=True)
+            words = [w.copy() for w in sample]
+
+            def run():
+                for w in words:
+                    db.getWord(w)
+
+            return run, len(words)
+
+        def store(path=path, setup=setup, delay=None):
+            sample = setup()
+            db = WordDB(path, flushDelay=delay)
+            words = sample[:100]
+
+            def run():
+                for w in words:
+                    db.storeWord(w)
+                db.flush()
+
+            return run, len(words)
+
+        def lookup(path=path, setup=setup):
+            sample = setup()
+            db = WordDB(path, cacheSize=0)
+            values = [w.value for w in sample]
+
+            def run():
+                for v in values:
+                    db.lookupWord(v)
+
+            return run, len(values)
+
+        out[f"db_getWord_uncached_{size}"] = getUncached
+        out[f"db_resolveWords_uncached_{size}"] = resolveUncached
+        out[f"db_getWord_preloaded_{size}"] = getPreloaded
+        out[f"db_storeWord_commit_each_{size}"] = store
+        out[f"db_storeWord_batched_{size}"] = lambda store=store: store(
+            delay=60)
+        out[f"db_lookupWord_{size}"] = lookup
+    return out
+
+
+def compare(results: Dict[str, Dict[str, float]], baselinePath: str,
+            threshold: float) -> List[str]:
+    """
+    Get the names of benchmarks more than threshold (fraction) slower than the baseline
+    """
+    with open(baselinePath, encoding="utf-8") as f:
+        baseline = json.load(f)["results"]
+
+    regressions = []
+    for name, res in results.items():
+        if name not in baseline:
+            continue
+        before = baseline[name]["ns_per_op"]
+        after = res["ns_per_op"]
+        change = (after - before) / before
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:40} {before:12.1f} -> {after:12.1f} ns/op "
+              f"({change:+.1%}){flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("-o", "--output", help="write results JSON here")
+    parser.add_argument("--compare", help="baseline results JSON")
+    parser.add_argument("--threshold",
+                        type=float,
+                        default=0.2,
+                        help="allowed slowdown vs the baseline, as a fraction")
+    parser.add_argument("-k",
+                        "--filter",
+                        default="",
+                        help="only run benchmarks matching this regex")
+    parser.add_argument(
+        "--db-sizes",
+        default=",".join(str(x) for x in DEFAULT_DB_SIZES),
+        help="comma separated dictionary sizes for the WordDB benchmarks")
+    args = parser.parse_args()
+
+    sizes = [int(x) for x in args.db_sizes.split(",") if len(x) > 0]
+    pattern = re.compile(args.filter)
+
+    with tempfile.TemporaryDirectory() as tmpDir:
+        benchmarks: Dict[str, Benchmark] = {
+            "glyph_getSoundStr": benchGlyphSoundStr,
+            "word_getSoundStr": benchWordSoundStr,
+            "glyphFromStr": benchGlyphFromStr,
+            "wordFromStr": benchWordFromStr,
+            "renderGlyph": benchRender,
+            "renderGlyph_wordline": benchRenderWordLine,
+            "renderGlyph_atlas": benchRenderAtlas,
+            "atlas_rasterize": benchAtlasRasterize,
+        }
+        benchmarks.update(dbBenchmarks(tmpDir, sizes))
+
+        results: Dict[str, Dict[str, float]] = {}
+        for name, bench in benchmarks.items():
+            if not pattern.search(name):
+                continue
+            setup = bench()
+            if setup is None:
+                print(f"{name:40} skipped", file=sys.stderr)
+                continue
+            func, ops = setup
+            res = timeit(func, ops)
+            results[name] = res
+            print(f"{name:40} {res['ns_per_op']:12.1f} ns/op",
+                  file=sys.stderr)
+
+    if args.output is not None:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "meta": {
+                        "python": platform.python_version(),
+                        "platform": platform.platform(),
+                        "time": time.time(),
+                    },
+                    "results": results,
+                },
+                f,
+                indent=2)
+
+    if args.compare is not None:
+        if len(compare(results, args.compare, args.threshold)) > 0:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
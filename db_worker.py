@@ -0,0 +1,402 @@
+"""
+WordDB on a worker thread, so the render loop never waits on SQLite
+"""
+import sys
+import threading
+import traceback
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import (Any, Callable, Dict, Hashable, List, Sequence, Tuple,
+                    TypeVar)
+
+from glyphs import Word
+from word_db import WordDB, DEFAULT_DB_PATH
+from pattern_index import GlyphPattern
+
+T = TypeVar("T")
+# runs on the worker thread, with its DB
+DBFunc = Callable[[WordDB], Any]
+
+# shown in place of a translation that is still being looked up
+PENDING_TEXT = "…"
+
+# seconds between checks for queued writes to commit, while idle
+_TICK_INTERVAL = 0.25
+
+
+class AsyncWordDB:
+    """
+    Owns a WordDB on a worker thread, requests are queued and answered
+    with Futures.
+
+    Coalescing:
+    Reads identical to one that is queued or running share its Future.
+    Stores to a word that is still queued replace the queued value,
+    so only the last one is written.
+
+    Callbacks:
+    Futures complete on the worker thread. Callbacks given to the request
+    methods are run on the calling thread by poll(), call it once per frame.
+    wake is called from the worker after requests complete, so an idle
+    render loop can be woken up to deliver them (e.g. glfw.PostEmptyEvent).
+
+    Translations are cached here as they arrive, value() and getWord()
+    answer from the cache when they can and never block.
+    """
+
+    def __init__(self,
+                 path: str = DEFAULT_DB_PATH,
+                 wake: Callable[[], None] | None = None,
+                 cacheSize: int = 1 << 16,
+                 **dbArgs) -> None:
+        """
+        dbArgs are passed to the WordDB
+        """
+        self.wake = wake
+        self.cacheSize = cacheSize
+
+        self._lock = threading.Lock()
+        self._ready = threading.Condition(self._lock)
+        # key -> (func, future), not started yet
+        self._queue: OrderedDict[Hashable, Tuple[DBFunc, Future]] = OrderedDict()
+        # key -> future, queued or running
+        self._inFlight: Dict[Hashable, Future] = {}
+        self._closing = False
+        # set if the worker stopped on an error
+        self._error: BaseException | None = None
+
+        # owned by the caller's thread
+        self._callbacks: List[Tuple[Future, Callable[[Any], None]]] = []
+        # word key -> translation
+        self._values: OrderedDict[bytes, str] = OrderedDict()
+        # word key with a lookup in flight -> words to set once it arrives
+        self._waiting: Dict[bytes, List[Word]] = {}
+        # keys from getWord() not requested yet, sent together by dispatch()
+        self._unrequested: List[bytes] = []
+        # called from poll() after requested translations arrive
+        self.onValues: Callable[[], None] | None = None
+        # only the latest prefix search is wanted
+        self._prefixKey: Hashable = None
+
+        opened: Future = Future()
+        self._thread = threading.Thread(target=self._run,
+                                        args=(path, dbArgs, opened),
+                                        name="WordDB",
+                                        daemon=True)
+        self._thread.start()
+        # fail here rather than on the first request
+        opened.result()
+
+    def __enter__(self) -> 'AsyncWordDB':
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    # Worker thread
+
+    def _run(self, path: str, dbArgs: Dict[str, Any], opened: Future):
+        try:
+            db = WordDB(path, **dbArgs)
+        except BaseException as err:
+            opened.set_exception(err)
+            return
+        opened.set_result(None)
+
+        # only the first of a run of failed flushes is reported
+        tickFailed = False
+        try:
+            while True:
+                with self._ready:
+                    if len(self._queue) == 0 and not self._closing:
+                        self._ready.wait(
+                            _TICK_INTERVAL if db.hasPendingWrites() else None)
+                    if len(self._queue) == 0 and self._closing:
+                        break
+                    batch = list(self._queue.items())
+                    self._queue.clear()
+
+                for key, (func, future) in batch:
+                    if future.set_running_or_notify_cancel():
+                        try:
+                            future.set_result(func(db))
+                        except BaseException as err:
+                            future.set_exception(err)
+                    with self._lock:
+                        if self._inFlight.get(key) is future:
+                            del self._inFlight[key]
+
+                try:
+                    db.tick()
+                    tickFailed = False
+                except Exception:
+                    # writes stay queued in the DB and are retried
+                    if not tickFailed:
+                        print("Word DB flush failed:", file=sys.stderr)
+                        traceback.print_exc()
+                    tickFailed = True
+                if len(batch) > 0 and self.wake is not None:
+                    self.wake()
+        except BaseException as err:
+            self._fail(err)
+            raise
+        finally:
+            try:
+                db.close()
+            except Exception:
+                print("Word DB close failed:", file=sys.stderr)
+                traceback.print_exc()
+
+    def _fail(self, err: BaseException):
+        """
+        The worker stopped, fail everything queued and refuse new requests
+        """
+        with self._lock:
+            self._closing = True
+            self._error = err
+            batch = list(self._queue.values())
+            self._queue.clear()
+            self._inFlight.clear()
+        for _, future in batch:
+            if future.set_running_or_notify_cancel():
+                future.set_exception(
+                    RuntimeError(f"Word DB worker stopped: {err!r}"))
+
+    # Caller's thread
+
+    def submit(self,
+               func: DBFunc,
+               key: Hashable = None,
+               callback: Callable[[Any], None] | None = None,
+               replace: bool = False) -> Future:
+        """
+        Queue func to run with the DB.
+        Requests with the same key share a Future while queued or running.
+        With replace, a queued request with the same key runs func instead
+        of its own. callback gets the result, from poll()
+        """
+        with self._lock:
+            if self._error is not None:
+                raise RuntimeError(
+                    f"Word DB worker stopped: {self._error!r}")
+            if self._closing:
+                raise RuntimeError("Word DB is closed")
+            if key is None:
+                key = object()
+
+            queued = self._queue.get(key)
+            if replace and queued is not None:
+                future = queued[1]
+                self._queue[key] = (func, future)
+            else:
+                future = None if replace else self._inFlight.get(key)
+                if future is None:
+                    future = Future()
+                    self._queue[key] = (func, future)
+                    self._inFlight[key] = future
+            self._ready.notify()
+
+        if callback is not None:
+            self._callbacks.append((future, callback))
+        return future
+
+    def call(self, func: Callable[[WordDB], T]) -> T:
+        """
+        Run func with the DB and wait for the result.
+        Only for things that have to block anyway, like saving
+        """
+        return self.submit(func).result()
+
+    def poll(self):
+        """
+        Send batched lookups and run the callbacks of completed requests
+        """
+        self.dispatch()
+        if len(self._callbacks) == 0:
+            return
+        done = []
+        waiting = []
+        for c in self._callbacks:
+            (done if c[0].done() else waiting).append(c)
+        self._callbacks = waiting
+
+        for future, callback in done:
+            if future.cancelled():
+                continue
+            err = future.exception()
+            if err is not None:
+                print("Word DB request failed:", file=sys.stderr)
+                traceback.print_exception(err)
+                continue
+            callback(future.result())
+
+    def pending(self) -> bool:
+        """
+        True while there are lookups to send or results left to deliver
+        """
+        return len(self._callbacks) > 0 or len(self._unrequested) > 0
+
+    def close(self):
+        """
+        Finish queued requests, commit writes and stop the worker
+        """
+        if not self._closing:
+            self.dispatch()
+        with self._ready:
+            if self._closing:
+                return
+            self._closing = True
+            self._ready.notify()
+        self._thread.join()
+        self.poll()
+
+    # Translations
+
+    def _cachePut(self, key: bytes, value: str):
+        self._values[key] = value
+        self._values.move_to_end(key)
+        if len(self._values) > self.cacheSize:
+            self._values.popitem(last=False)
+
+    def isPending(self, key: bytes) -> bool:
+        return key in self._waiting
+
+    def value(self, key: bytes) -> str | None:
+        """
+        Get the translation of a word key if it's known,
+        otherwise request it and return None
+        """
+        value = self._values.get(key)
+        if value is not None:
+            self._values.move_to_end(key)
+            return value
+        if key not in self._waiting:
+            self._waiting[key] = []
+            self._unrequested.append(key)
+        return None
+
+    def _requestValues(self, keys: List[bytes]):
+        # a store or newer request replaces the waiting list,
+        # and this result is stale for that key
+        waiting = {k: self._waiting[k] for k in keys}
+
+        def received(values: List[str]):
+            for key, value in zip(keys, values):
+                words = waiting[key]
+                if self._waiting.get(key) is not words:
+                    continue
+                del self._waiting[key]
+                self._cachePut(key, value)
+                for word in words:
+                    # skip words edited since
+                    if len(word.value) == 0 and word.getKey() == key:
+                        word.value = value
+            if self.onValues is not None:
+                self.onValues()
+
+        def lookup(db: WordDB) -> List[str]:
+            values = db.getValues(keys)
+            return [values.get(k, "") for k in keys]
+
+        # not keyed, _waiting already keeps a key to one request
+        self.submit(lookup, None, received)
+
+    def dispatch(self):
+        """
+        Request every key queued by getWord() and value() in one lookup
+        """
+        if len(self._unrequested) == 0:
+            return
+        # a store since may have answered some already
+        keys = [
+            k for k in dict.fromkeys(self._unrequested) if k in self._waiting
+        ]
+        self._unrequested = []
+        if len(keys) > 0:
+            self._requestValues(keys)
+
+    def getWord(self, word: Word) -> bool:
+        """
+        Set word's translation from the cache and return True, otherwise clear
+        it and return False. The translation is then looked up, and set on
+        word when it arrives unless word has been changed since.
+        Lookups are batched until the next dispatch() or poll()
+        """
+        return self._getWords([word], self._unrequested)
+
+    def getWords(self, words: Sequence[Word]) -> bool:
+        """
+        getWord() for many words, looked up in one request sent now
+        """
+        new: List[bytes] = []
+        known = self._getWords(words, new)
+        if len(new) > 0:
+            self._requestValues(new)
+        return known
+
+    def _getWords(self, words: Sequence[Word], new: List[bytes]) -> bool:
+        """
+        Set cached translations, and add keys that need a lookup to new
+        """
+        known = True
+        for word in words:
+            key = word.getKey()
+            value = self._values.get(key)
+            if value is not None:
+                word.value = value
+                continue
+            word.value = ""
+            known = False
+            waiting = self._waiting.get(key)
+            if waiting is None:
+                waiting = []
+                self._waiting[key] = waiting
+                new.append(key)
+            waiting.append(word)
+        return known
+
+    def storeWord(self, word: Word):
+        """
+        Queue a write, visible to value() and getWord() immediately
+        """
+        key = word.getKey()
+        self._cachePut(key, word.value)
+        for waiting in self._waiting.pop(key, ()):
+            if len(waiting.value) == 0 and waiting.getKey() == key:
+                waiting.value = word.value
+        # the DB keeps the word for its indexes
+        stored = word.copy()
+        self.submit(lambda db: db.storeWord(stored), ("store", key),
+                    replace=True)
+
+    def flush(self):
+        self.submit(lambda db: db.flush(), ("flush", ))
+
+    # Searches
+
+    def searchPrefix(self, prefix: str, limit: int,
+                     callback: Callable[[List[Tuple[str, bytes]]], None]):
+        """
+        Like WordDB.searchPrefix(), but a newer search cancels this one.
+        callback only gets the results of the latest search
+        """
+        key = ("prefix", prefix, limit)
+        self._prefixKey = key
+
+        def search(db: WordDB):
+            return db.searchPrefix(prefix, limit,
+                                   lambda: self._prefixKey != key)
+
+        def received(results: List[Tuple[str, bytes]] | None):
+            if results is not None and self._prefixKey == key:
+                callback(results)
+
+        self.submit(search, key, received)
+
+    def searchPattern(self, pattern: List[GlyphPattern], limit: int,
+                      prefix: bool,
+                      callback: Callable[[List[Tuple[str, bytes]]], None]):
+        key = ("pattern", tuple((p.required, p.forbidden) for p in pattern),
+               limit, prefix)
+        self.submit(lambda db: db.searchPattern(pattern, limit, prefix), key,
+                    callback)
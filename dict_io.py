@@ -0,0 +1,247 @@
+"""
+Bulk import and export of the word dictionary, as CSV or JSONL
+(sound string, translation) pairs.
+
+Files are streamed, and imported in chunks of one transaction each.
+Sound strings are validated, and exported in the Word.getSoundStr() form.
+
+    python dict_io.py import shared.csv [--policy keep]
+    python dict_io.py export words.jsonl
+"""
+import argparse
+import csv
+import enum
+import json
+import sys
+from typing import Callable, Dict, Iterable, Iterator, List, TextIO, Tuple
+
+from glyphs import Word, codesFromStr, strFromKey, SoundStrError
+from word_db import WordDB, DEFAULT_DB_PATH
+
+DEFAULT_CHUNK_ROWS = 10000
+
+CSV_HEADER = ["sounds", "value"]
+
+# (line number, sound string, translation, error message or None)
+DictRow = Tuple[int, str, str, str | None]
+
+
+class ConflictPolicy(enum.Enum):
+    # replace existing translations
+    OVERWRITE = "overwrite"
+    # keep existing translations
+    KEEP = "keep"
+    # keep existing translations, and list the ones that differ
+    REPORT = "report"
+
+
+class ImportStats:
+
+    __slots__ = ("read", "stored", "skipped", "invalid", "conflicts")
+
+    def __init__(self) -> None:
+        self.read = 0
+        self.stored = 0
+        # already translated, not stored because of the conflict policy
+        self.skipped = 0
+        # (line number, error message)
+        self.invalid: List[Tuple[int, str]] = []
+        # (sound string, existing value, imported value), with REPORT
+        self.conflicts: List[Tuple[str, str, str]] = []
+
+
+ProgressFunc = Callable[[ImportStats], None]
+
+
+def readCSV(stream: TextIO) -> Iterator[DictRow]:
+    """
+    Read sound string, translation rows, with an optional header
+    """
+    reader = csv.reader(stream)
+    for row in reader:
+        lineNum = reader.line_num
+        if len(row) == 0 or (lineNum == 1 and row == CSV_HEADER):
+            continue
+        if len(row) != 2:
+            yield lineNum, "", "", f"expected 2 columns, got {len(row)}"
+        else:
+            yield lineNum, row[0], row[1], None
+
+
+def readJSONL(stream: TextIO) -> Iterator[DictRow]:
+    """
+    Read {"sounds": ..., "value": ...} records, one per line
+    """
+    for lineNum, line in enumerate(stream, 1):
+        if len(line.strip()) == 0:
+            continue
+        try:
+            record = json.loads(line)
+            sounds = record["sounds"]
+            value = record["value"]
+        except (ValueError, KeyError, TypeError) as err:
+            yield lineNum, "", "", f"bad record: {err}"
+            continue
+        if not isinstance(sounds, str) or not isinstance(value, str):
+            yield lineNum, "", "", "sounds and value must be strings"
+        else:
+            yield lineNum, sounds, value, None
+
+
+def writeCSV(out: TextIO, words: Iterable[Tuple[str, str]]):
+    writer = csv.writer(out, lineterminator="\n")
+    writer.writerow(CSV_HEADER)
+    writer.writerows(words)
+
+
+def writeJSONL(out: TextIO, words: Iterable[Tuple[str, str]]):
+    for sounds, value in words:
+        json.dump({"sounds": sounds, "value": value}, out, ensure_ascii=False)
+        out.write("\n")
+
+
+READERS = {"csv": readCSV, "jsonl": readJSONL}
+WRITERS = {"csv": writeCSV, "jsonl": writeJSONL}
+
+
+def formatOf(path: str) -> str:
+    return "csv" if path.lower().endswith(".csv") else "jsonl"
+
+
+def _importChunk(db: WordDB, rows: List[DictRow], policy: ConflictPolicy,
+                 stats: ImportStats):
+    # key -> word, later rows win
+    valid: Dict[bytes, Word] = {}
+    for lineNum, sounds, value, error in rows:
+        if error is None:
+            value = value.strip()
+            if len(value) == 0:
+                error = "empty translation"
+            else:
+                try:
+                    codes = codesFromStr(sounds.strip())
+                except SoundStrError as err:
+                    error = str(err)
+        if error is not None:
+            stats.invalid.append((lineNum, error))
+            continue
+
+        # the same glyphs can be written more than one way
+        word = Word.fromCodes(codes, value)
+        if policy != ConflictPolicy.OVERWRITE:
+            # the first one is kept, like an existing translation
+            valid.setdefault(word.getKey(), word)
+        else:
+            valid[word.getKey()] = word
+
+    if policy != ConflictPolicy.OVERWRITE:
+        existing = db.getValues(list(valid))
+        for key, old in existing.items():
+            word = valid.pop(key)
+            stats.skipped += 1
+            if policy == ConflictPolicy.REPORT and word.value != old:
+                stats.conflicts.append((word.getSoundStr(), old, word.value))
+
+    db.storeWords(valid.values())
+    stats.stored += len(valid)
+
+
+def importWords(db: WordDB,
+                rows: Iterable[DictRow],
+                policy: ConflictPolicy = ConflictPolicy.OVERWRITE,
+                chunkRows: int = DEFAULT_CHUNK_ROWS,
+                progress: ProgressFunc | None = None) -> ImportStats:
+    """
+    Store every valid row, chunkRows at a time, each chunk in one transaction.
+    progress is called after each chunk
+    """
+    stats = ImportStats()
+    chunk: List[DictRow] = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunkRows:
+            stats.read += len(chunk)
+            _importChunk(db, chunk, policy, stats)
+            chunk = []
+            if progress is not None:
+                progress(stats)
+    if len(chunk) > 0:
+        stats.read += len(chunk)
+        _importChunk(db, chunk, policy, stats)
+        if progress is not None:
+            progress(stats)
+    return stats
+
+
+def importFile(db: WordDB,
+               path: str,
+               policy: ConflictPolicy = ConflictPolicy.OVERWRITE,
+               chunkRows: int = DEFAULT_CHUNK_ROWS,
+               progress: ProgressFunc | None = None) -> ImportStats:
+    with open(path, encoding="utf-8", newline="") as f:
+        return importWords(db, READERS[formatOf(path)](f), policy, chunkRows,
+                           progress)
+
+
+def exportFile(db: WordDB, path: str) -> int:
+    """
+    Write every stored translation, returns the number written
+    """
+    count = 0
+
+    def counted() -> Iterator[Tuple[str, str]]:
+        nonlocal count
+        for key, value in db.iterWords():
+            count += 1
+            yield strFromKey(key), value
+
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        WRITERS[formatOf(path)](f, counted())
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("action", choices=["import", "export"])
+    parser.add_argument("file",
+                        help=".csv, anything else is read/written as JSONL")
+    parser.add_argument("--policy",
+                        choices=[p.value for p in ConflictPolicy],
+                        default=ConflictPolicy.OVERWRITE.value,
+                        help="what to do with words that are already translated")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, help="word DB path")
+    parser.add_argument("--chunk-size",
+                        type=int,
+                        default=DEFAULT_CHUNK_ROWS,
+                        help="rows per transaction")
+    args = parser.parse_args()
+
+    with WordDB(args.db, flushDelay=None) as db:
+        if args.action == "export":
+            count = exportFile(db, args.file)
+            print(f"exported {count} words", file=sys.stderr)
+            return
+
+        def progress(stats: ImportStats):
+            print(f"\r{stats.read} read, {stats.stored} stored",
+                  end="",
+                  file=sys.stderr)
+
+        stats = importFile(db, args.file, ConflictPolicy(args.policy),
+                           args.chunk_size, progress)
+
+    print(file=sys.stderr)
+    print(
+        f"{stats.read} read, {stats.stored} stored, {stats.skipped} skipped, "
+        f"{len(stats.invalid)} invalid, {len(stats.conflicts)} conflicts",
+        file=sys.stderr)
+    for lineNum, error in stats.invalid:
+        print(f"invalid: line {lineNum}: {error}", file=sys.stderr)
+    for soundStr, old, value in stats.conflicts:
+        print(f"conflict: {soundStr}: {old!r} kept, {value!r} not imported",
+              file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,219 @@
+"""
+Saving and loading documents (a sequence of words).
+
+Binary layout, little endian:
+    header      magic, version, word count, glyph count, override count
+    offsets     word count + 1 uint32, glyph index where each word starts
+    codes       glyph count uint16 glyph codes
+    overrides   per entry: uint32 word index, uint32 byte length, UTF-8 value
+
+Overrides are translations stored with the document instead of coming from
+the dictionary. Words without one get their value from the WordDB on load.
+"""
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_right
+from typing import Dict, Iterator, List, Sequence
+
+from glyphs import (Word, GLYPH_CODE_TYPE, isValidCode, wordsFromStr,
+                    strFromWords)
+
+DOC_MAGIC = b"TRNC"
+DOC_VERSION = 1
+DOC_EXT = ".tdoc"
+
+_HEADER = struct.Struct("<4sHxxIII")
+_OVERRIDE = struct.Struct("<II")
+_OFFSET_TYPE = "I"
+
+# arrays are stored little endian, swap when reading/writing on big endian
+_SWAP = sys.byteorder == "big"
+
+
+class DocumentError(ValueError):
+    """
+    Raised when a document file is malformed
+    """
+
+
+def _pack(typecode: str, values: array) -> bytes:
+    if _SWAP:
+        values = array(typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _unpack(typecode: str, data) -> array:
+    out = array(typecode)
+    out.frombytes(data)
+    if _SWAP:
+        out.byteswap()
+    return out
+
+
+def saveDocument(path: str,
+                 words: Sequence[Word],
+                 overrides: Dict[int, str] | None = None):
+    """
+    Write words to path.
+    overrides: word index -> translation to store with the document
+    """
+    offsets = array(_OFFSET_TYPE, [0])
+    codes = array(GLYPH_CODE_TYPE)
+    for word in words:
+        codes.extend(word.codes)
+        offsets.append(len(codes))
+
+    table = []
+    if overrides is not None:
+        for wIdx, value in sorted(overrides.items()):
+            data = value.encode("utf-8")
+            table.append(_OVERRIDE.pack(wIdx, len(data)))
+            table.append(data)
+
+    # write to a temp file first so a failed save doesn't destroy the old one
+    tmpPath = path + ".tmp"
+    with open(tmpPath, "wb") as f:
+        f.write(
+            _HEADER.pack(DOC_MAGIC, DOC_VERSION, len(words), len(codes),
+                         0 if overrides is None else len(overrides)))
+        f.write(_pack(_OFFSET_TYPE, offsets))
+        f.write(_pack(GLYPH_CODE_TYPE, codes))
+        f.write(b"".join(table))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmpPath, path)
+
+
+class MappedDocument:
+    """
+    A document file opened with mmap.
+    Only the header and override table are parsed up front, words are
+    decoded when accessed and kept for later accesses
+    """
+
+    def __init__(self, path: str) -> None:
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # can't map an empty file
+            self._file.close()
+            raise DocumentError(f"{path}: empty file") from None
+
+        try:
+            self._parse(path)
+        except Exception:
+            self.close()
+            raise
+
+    def validate(self, path: str):
+        """
+        Check every word up front, so decoding them later can't fail
+        """
+        offsets = self._offsets
+        for idx in range(len(offsets) - 1):
+            # decreasing offsets would slice an empty word too
+            if offsets[idx] >= offsets[idx + 1]:
+                raise DocumentError(f"{path}: word {idx} has no glyphs")
+
+        codes = _unpack(GLYPH_CODE_TYPE,
+                        self._map[self._codeStart:self._codeStart +
+                                  offsets[-1] * 2])
+        # few distinct codes, so only those are checked
+        for code in set(codes):
+            if not isValidCode(code):
+                idx = bisect_right(offsets, codes.index(code)) - 1
+                raise DocumentError(
+                    f"{path}: word {idx} has invalid glyph code {code}")
+
+    def _parse(self, path: str):
+        if len(self._map) < _HEADER.size:
+            raise DocumentError(f"{path}: truncated header")
+        magic, version, numWords, numGlyphs, numOverrides = _HEADER.unpack_from(
+            self._map)
+        if magic != DOC_MAGIC:
+            raise DocumentError(f"{path}: not a document file")
+        if version != DOC_VERSION:
+            raise DocumentError(f"{path}: unsupported version {version}")
+
+        offsetStart = _HEADER.size
+        codeStart = offsetStart + (numWords + 1) * 4
+        tableStart = codeStart + numGlyphs * 2
+        if len(self._map) < tableStart:
+            raise DocumentError(f"{path}: truncated")
+
+        self._offsets = _unpack(_OFFSET_TYPE,
+                                self._map[offsetStart:codeStart])
+        if self._offsets[0] != 0 or self._offsets[-1] != numGlyphs:
+            raise DocumentError(f"{path}: bad word offsets")
+        self._codeStart = codeStart
+
+        self.overrides: Dict[int, str] = {}
+        pos = tableStart
+        for _ in range(numOverrides):
+            if pos + _OVERRIDE.size > len(self._map):
+                raise DocumentError(f"{path}: truncated override table")
+            wIdx, length = _OVERRIDE.unpack_from(self._map, pos)
+            pos += _OVERRIDE.size
+            self.overrides[wIdx] = str(self._map[pos:pos + length], "utf-8")
+            pos += length
+
+        self._words: List[Word | None] = [None] * numWords
+
+    def __enter__(self) -> 'MappedDocument':
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def __len__(self) -> int:
+        return len(self._words)
+
+    def wordLength(self, idx: int) -> int:
+        """
+        Number of glyphs in a word, without decoding it
+        """
+        return self._offsets[idx + 1] - self._offsets[idx]
+
+    def __getitem__(self, idx: int) -> Word:
+        word = self._words[idx]
+        if word is None:
+            start = self._codeStart + self._offsets[idx] * 2
+            end = self._codeStart + self._offsets[idx + 1] * 2
+            word = Word._wrap(_unpack(GLYPH_CODE_TYPE, self._map[start:end]),
+                              self.overrides.get(idx, ""))
+            if len(word) == 0 or not all(isValidCode(c) for c in word.codes):
+                raise DocumentError(f"word {idx} is invalid")
+            self._words[idx] = word
+        return word
+
+    def __iter__(self) -> Iterator[Word]:
+        for idx in range(len(self._words)):
+            yield self[idx]
+
+
+def loadDocument(path: str) -> MappedDocument:
+    return MappedDocument(path)
+
+
+def exportText(path: str, words: Sequence[Word]):
+    """
+    Write the words as whitespace separated sound strings.
+    Translations are not kept, and empty words are dropped on import
+    """
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(strFromWords(words))
+        f.write("\n")
+
+
+def importText(path: str) -> List[Word]:
+    with open(path, encoding="utf-8") as f:
+        return wordsFromStr(f.read())
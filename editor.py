@@ -0,0 +1,851 @@
+import importlib.util
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Dict, Tuple
+
+import imgui as im
+from imgui import glfw
+
+from window_boilerplate import window_mainloop, IdleConfig
+from glyphs import Word, Glyph, GLYPH_TOTAL_Y, GLYPH_TOTAL_X, GLYPH_X, Cons, Vowel, CONS_EXAMPLES, VOW_EXAMPLES, strFromKey, strFromWords, parseWords
+from db_worker import AsyncWordDB, PENDING_TEXT
+from layout import WordLayout
+from word_buffer import WordBuffer
+import glyph_render
+from glyph_render import renderGlyph
+from pattern_index import patternFromWord
+from edits import Edit, EditOp, applyEdit, inverseOf
+from history import UndoHistory
+from journal import Journal
+from document import (DOC_EXT, DocumentError, MappedDocument, saveDocument,
+                      loadDocument, exportText)
+
+EDITOR_SCALE = 0.5
+
+# opened by recognizing the glyphs in them, only PNG without Pillow
+if importlib.util.find_spec("PIL") is not None:
+    IMAGE_EXTS = (".png", ".jpg", ".jpeg", ".bmp")
+else:
+    IMAGE_EXTS = (".png", )
+
+# max candidates shown in the lookup window
+LOOKUP_RESULTS = 10
+# max matches shown in the pattern window
+PATTERN_RESULTS = 100
+
+# tokens parsed per step of a text import,
+# and the seconds of each frame spent importing
+IMPORT_CHUNK_WORDS = 200
+IMPORT_FRAME_SECONDS = 0.01
+
+# offset of the first glyph in the data window
+DATA_MARGIN_X = 10
+DATA_MARGIN_Y = 25
+
+TABLE_FLAGS = im.TableFlags.Borders | im.TableFlags.NoHostExtendX | im.TableFlags.SizingStretchSame
+
+SELECT_HIGHLIGHT = im.ColorConvertFloat4ToU32(im.Vec4(0.2, 0.2, 0.2, 1.0))
+BTN_HIGHLIGHT = im.ColorConvertFloat4ToU32(im.Vec4(0.3, 0.3, 0.3, 1.0))
+
+
+def glyphButton(btnID: str,
+                g: Glyph,
+                dl: im.ImDrawList,
+                wordLine: bool,
+                scale: float,
+                highlight: bool,
+                pad: float = 0) -> bool:
+    buttonSize = im.Vec2(pad + GLYPH_TOTAL_X * scale,
+                         pad + GLYPH_TOTAL_Y * scale)
+    pos = im.GetCursorScreenPos()
+    out = im.InvisibleButton(btnID, buttonSize)
+    if highlight:
+        dl.AddRectFilled(pos,
+                         im.Vec2(pos.x + buttonSize.x, pos.y + buttonSize.y),
+                         SELECT_HIGHLIGHT, 0)
+    if im.IsItemHovered():
+        dl.AddRectFilled(pos,
+                         im.Vec2(pos.x + buttonSize.x, pos.y + buttonSize.y),
+                         BTN_HIGHLIGHT, 0)
+
+    glyph_pos = im.Vec2(pos.x + pad / 2, pos.y + pad / 2)
+    renderGlyph(dl, g, glyph_pos, wordLine, scale)
+
+    return out
+
+
+class TextImport:
+    """
+    Sound string text being parsed into the document over several frames,
+    inserted at wordIdx as it's parsed, or replacing the document once done
+    """
+
+    def __init__(self,
+                 text: str,
+                 wordIdx: int | None,
+                 source: str,
+                 replace: bool = False) -> None:
+        self.chunks = parseWords(text, IMPORT_CHUNK_WORDS)
+        self.size = max(1, len(text))
+        # characters parsed so far
+        self.parsed = 0
+        self.wordIdx = wordIdx
+        # the first parsed word replaces the word at wordIdx
+        self.replace = replace
+        # parsed words, when replacing the document
+        self.words: List[Word] = []
+        self.count = 0
+        self.errors: List[str] = []
+        self.source = source
+
+    @property
+    def progress(self) -> float:
+        return self.parsed / self.size
+
+
+class State:
+
+    def __init__(self) -> None:
+        self.wordLine = im.BoolRef(True)
+        self.atlas = im.BoolRef(glyph_render.useAtlas)
+        self.words = WordBuffer([Word(Glyph())])
+        # open document words are lazily decoded from
+        self._mappedDoc: MappedDocument | None = None
+
+        self.lookupText = im.StrRef(124)
+        self.lookupWord: Word | None = None
+        # (value, word key) candidates for the lookup text
+        self.lookupResults: List[Tuple[str, bytes]] = []
+        self.lookupSel = 0
+        self.lookupPending = False
+        # partial glyph search using the selected word as the pattern
+        self.patternExact = im.BoolRef(False)
+        self.patternPrefix = im.BoolRef(False)
+        self.patternResults: List[Tuple[str, bytes]] = []
+        self._patternKey = None
+        self.patternPending = False
+        # edit buffer for the selected word's translation
+        self.transText = im.StrRef(50)
+        # SQLite lives on a worker thread, translations arrive in later frames
+        self.wordDB = AsyncWordDB(preload=True)
+        self.wordDB.onValues = self._valuesArrived
+        # path for the file window, .txt is treated as sound string text
+        self.docPath = im.StrRef(260)
+        self.docPath.set("document" + DOC_EXT)
+        self.fileStatus = ""
+        # pasted or opened text still being parsed
+        self.textImport: TextImport | None = None
+        # image path and its recognized words, recognized on a worker thread
+        self.recognizing: Tuple[str, Future] | None = None
+        self._recognizer = ThreadPoolExecutor(1, "Recognize")
+
+        # incremented on every document edit
+        self.docVersion = 0
+        self.history = UndoHistory()
+        # autosave, restores the last session
+        self.journal = Journal()
+        recovered = self.journal.recover()
+        if recovered is not None and len(recovered) > 0:
+            self.wordDB.getWords([w for w in recovered if len(w.value) == 0])
+            self.words = WordBuffer(recovered)
+        else:
+            self.journal.compact(self.words)
+        self.layout = WordLayout()
+        self.dataWidth = 0.0
+        self._text = ""
+        self._textKey: Tuple[int, float] | None = None
+
+    # The cursor lives in the word buffer
+
+    @property
+    def selectedWordIdx(self) -> int:
+        return self.words.wordIdx
+
+    @selectedWordIdx.setter
+    def selectedWordIdx(self, idx: int):
+        self.words.wordIdx = idx
+
+    @property
+    def selectedGlyphIdx(self) -> int:
+        return self.words.glyphIdx
+
+    @selectedGlyphIdx.setter
+    def selectedGlyphIdx(self, idx: int):
+        self.words.glyphIdx = idx
+
+    def updateLookup(self):
+        """
+        Refresh the lookup candidates after the lookup text changes
+        """
+        text = self.lookupText.copy().strip()
+        if len(text) > 0:
+            self.lookupPending = True
+            self.wordDB.searchPrefix(text, LOOKUP_RESULTS, self._lookupDone)
+        else:
+            self.lookupPending = False
+            self.lookupResults = []
+            self.selectLookup(0)
+
+    def _lookupDone(self, results: List[Tuple[str, bytes]]):
+        # only called for the latest search
+        if self.lookupPending:
+            self.lookupPending = False
+            self.lookupResults = results
+            self.selectLookup(0)
+
+    def selectLookup(self, idx: int):
+        if len(self.lookupResults) == 0:
+            self.lookupSel = 0
+            self.lookupWord = None
+            return
+
+        self.lookupSel = max(0, min(idx, len(self.lookupResults) - 1))
+        value, key = self.lookupResults[self.lookupSel]
+        self.lookupWord = Word.fromKey(key, value)
+
+    def updatePattern(self, word: Word):
+        """
+        Refresh the pattern matches if the selected word, search options or
+        dictionary changed
+        """
+        key = (word.codes, self.patternExact.val, self.patternPrefix.val,
+               self.docVersion)
+        if key == self._patternKey:
+            return
+        self._patternKey = key
+
+        if all(c == 0 for c in word.codes):
+            self.patternPending = False
+            self.patternResults = []
+            return
+
+        def done(results: List[Tuple[str, bytes]]):
+            if self._patternKey == key:
+                self.patternPending = False
+                self.patternResults = results
+
+        self.patternPending = True
+        pattern = patternFromWord(word, self.patternExact.val)
+        self.wordDB.searchPattern(pattern, PATTERN_RESULTS,
+                                  self.patternPrefix.val, done)
+
+    def pending(self) -> bool:
+        """
+        True while there's background work to show, so the idle loop keeps rendering
+        """
+        return (self.textImport is not None or self.recognizing is not None
+                or self.wordDB.pending())
+
+    def _valuesArrived(self):
+        """
+        Translations looked up in the background were set on their words
+        """
+        for line in self.layout.lines:
+            line.text = None
+        self._textKey = None
+
+    def setWords(self, words: List[Word]):
+        """
+        Replace the whole document
+        """
+        if len(words) == 0:
+            words = [Word(Glyph())]
+        self._closeDoc()
+        self.words = WordBuffer(words)
+        self.docVersion += 1
+        self.history.clear()
+        self.journal.compact(self.words)
+
+    def _closeDoc(self):
+        """
+        Decode everything left in the mapped document and close it
+        """
+        if self._mappedDoc is not None:
+            self.words.detach()
+            self._mappedDoc.close()
+            self._mappedDoc = None
+
+    def close(self):
+        self._recognizer.shutdown(cancel_futures=True)
+        glyph_render.releaseAtlases()
+        self._closeDoc()
+        self.journal.close()
+        self.wordDB.close()
+
+    # Edits
+    # Every document change goes through these so it is journaled and
+    # can be undone
+
+    def _record(self, edit: Edit, inverse: Edit):
+        self.journal.append(edit)
+        self.history.push(edit, inverse)
+        self.docVersion += 1
+
+    def _glyphUndo(self, op: EditOp, wIdx: int, gIdx: int) -> Edit:
+        return inverseOf(self.words, Edit(op, wIdx, gIdx))
+
+    def _glyphEdited(self, op: EditOp, wIdx: int, gIdx: int, code: int,
+                     inverse: Edit):
+        word = self.words[wIdx]
+        # empty until the lookup finishes if it isn't cached
+        self.wordDB.getWord(word)
+        self.words.touch(wIdx)
+        self._record(Edit(op, wIdx, gIdx, (code, ), word.value), inverse)
+
+    def toggleCons(self, cons: Cons):
+        wIdx, gIdx = self.selectedWordIdx, self.selectedGlyphIdx
+        inverse = self._glyphUndo(EditOp.SET_GLYPH, wIdx, gIdx)
+        g = self.words[wIdx].toggleCons(gIdx, cons)
+        self._glyphEdited(EditOp.SET_GLYPH, wIdx, gIdx, g.code, inverse)
+
+    def toggleVowel(self, vowel: Vowel):
+        wIdx, gIdx = self.selectedWordIdx, self.selectedGlyphIdx
+        inverse = self._glyphUndo(EditOp.SET_GLYPH, wIdx, gIdx)
+        g = self.words[wIdx].toggleVowel(gIdx, vowel)
+        self._glyphEdited(EditOp.SET_GLYPH, wIdx, gIdx, g.code, inverse)
+
+    def toggleDot(self):
+        wIdx, gIdx = self.selectedWordIdx, self.selectedGlyphIdx
+        inverse = self._glyphUndo(EditOp.SET_GLYPH, wIdx, gIdx)
+        g = self.words[wIdx].toggleDot(gIdx)
+        self._glyphEdited(EditOp.SET_GLYPH, wIdx, gIdx, g.code, inverse)
+
+    def insertGlyph(self, wIdx: int, gIdx: int):
+        inverse = self._glyphUndo(EditOp.INSERT_GLYPH, wIdx, gIdx)
+        self.words[wIdx].insertGlyph(gIdx, Glyph())
+        self._glyphEdited(EditOp.INSERT_GLYPH, wIdx, gIdx, 0, inverse)
+
+    def deleteGlyph(self, wIdx: int, gIdx: int):
+        inverse = self._glyphUndo(EditOp.DELETE_GLYPH, wIdx, gIdx)
+        self.words[wIdx].popGlyph(gIdx)
+        self._glyphEdited(EditOp.DELETE_GLYPH, wIdx, gIdx, 0, inverse)
+
+    def _applyEdit(self, edit: Edit):
+        applyEdit(self.words, edit)
+        if edit.op == EditOp.SET_VALUE:
+            self.wordDB.storeWord(self.words[edit.wordIdx])
+        elif edit.op != EditOp.DELETE_WORD and len(edit.value) == 0:
+            # recorded before its translation arrived
+            self.wordDB.getWord(self.words[edit.wordIdx])
+        if edit.op not in (EditOp.INSERT_WORD, EditOp.DELETE_WORD,
+                           EditOp.REPLACE_WORD):
+            self.words.touch(edit.wordIdx)
+
+    def edit(self, edit: Edit):
+        """
+        Apply a word level edit (not a glyph edit, their translation comes from the DB)
+        """
+        inverse = inverseOf(self.words, edit)
+        self._applyEdit(edit)
+        self._record(edit, inverse)
+
+    def insertWord(self, wIdx: int, word: Word):
+        self.edit(Edit(EditOp.INSERT_WORD, wIdx, 0, word.codes, word.value))
+
+    def deleteWord(self, wIdx: int):
+        self.edit(Edit(EditOp.DELETE_WORD, wIdx))
+
+    def replaceWord(self, wIdx: int, word: Word):
+        self.edit(Edit(EditOp.REPLACE_WORD, wIdx, 0, word.codes, word.value))
+
+    def setValue(self, wIdx: int, value: str):
+        self.edit(Edit(EditOp.SET_VALUE, wIdx, 0, (), value))
+
+    def _replay(self, edits: List[Edit] | None):
+        """
+        Apply undo or redo edits, and move the cursor to the last one
+        """
+        if edits is None:
+            return
+        for edit in edits:
+            self._applyEdit(edit)
+            self.journal.append(edit)
+        self.docVersion += 1
+
+        last = edits[-1]
+        self.selectedWordIdx = min(last.wordIdx, len(self.words) - 1)
+        self.selectedGlyphIdx = min(last.glyphIdx,
+                                    self.words.wordLength(self.selectedWordIdx) - 1)
+
+    def undo(self):
+        self._replay(self.history.undo())
+
+    def redo(self):
+        self._replay(self.history.redo())
+
+    def saveDoc(self, path: str):
+        if path.endswith(".txt"):
+            exportText(path, self.words)
+        else:
+            # only keep translations that differ from the dictionary
+            values = [(wIdx, word.getKey(), word.value)
+                      for wIdx, word in enumerate(self.words)
+                      if len(word.value) > 0]
+            overrides = self.wordDB.call(lambda db: {
+                wIdx: value
+                for wIdx, key, value in values
+                if db.getValue(key) != value
+            })
+            # can't replace a file that is still mapped on some platforms
+            self._closeDoc()
+            saveDocument(path, self.words, overrides)
+        self.fileStatus = f"Saved {len(self.words)} words to {path}"
+
+    # Text import/export
+
+    def pasteText(self, text: str, source: str = "clipboard"):
+        """
+        Start inserting sound string text after the selected word,
+        or in place of it if it's empty
+        """
+        wIdx = self.selectedWordIdx
+        replace = self.words[wIdx].isEmpty()
+        if not replace:
+            wIdx += 1
+        self.textImport = TextImport(text, wIdx, source, replace)
+
+    def copyText(self, wholeDoc: bool):
+        """
+        Copy the selected word or the whole document as sound strings
+        """
+        if wholeDoc:
+            words = self.words
+        else:
+            words = [self.words[self.selectedWordIdx]]
+        text = strFromWords(words)
+        im.SetClipboardText(text)
+        count = len(self.words) if wholeDoc else 1
+        self.fileStatus = f"Copied {count} words"
+
+    def _stepImport(self):
+        """
+        Parse and insert imported words until this frame's time is used up
+        """
+        imp = self.textImport
+        deadline = time.perf_counter() + IMPORT_FRAME_SECONDS
+        while time.perf_counter() < deadline:
+            chunk = next(imp.chunks, None)
+            if chunk is None:
+                self._finishImport()
+                return
+            words, errors, imp.parsed = chunk
+            imp.count += len(words)
+            imp.errors.extend(errors)
+            if imp.wordIdx is None:
+                imp.words.extend(words)
+                continue
+
+            # translations are looked up in one batch at the end of the frame
+            for word in words:
+                if imp.replace:
+                    # same undo group as the rest of the paste
+                    self.replaceWord(imp.wordIdx, word)
+                    imp.replace = False
+                else:
+                    self.insertWord(imp.wordIdx, word)
+                imp.wordIdx += 1
+
+    def _finishImport(self):
+        imp = self.textImport
+        self.textImport = None
+        if imp.wordIdx is None:
+            self.wordDB.getWords(imp.words)
+            self.setWords(imp.words)
+        elif imp.count > 0:
+            self.selectedWordIdx = imp.wordIdx - 1
+            self.selectedGlyphIdx = 0
+
+        self.fileStatus = f"Imported {imp.count} words from {imp.source}"
+        if len(imp.errors) > 0:
+            self.fileStatus += (f", skipped {len(imp.errors)} invalid: "
+                                f"{imp.errors[0]}")
+
+    def _recognized(self):
+        """
+        Open the recognized words once the worker is done
+        """
+        path, future = self.recognizing
+        if not future.done():
+            return
+        self.recognizing = None
+        try:
+            recognized = future.result()
+        except (OSError, ValueError) as err:
+            self.fileStatus = f"Error: {err}"
+            return
+
+        from recognize import DEFAULT_MIN_CONFIDENCE
+        words = [word for word, _ in recognized]
+        self.wordDB.getWords(words)
+        self.setWords(words)
+        uncertain = sum(c < DEFAULT_MIN_CONFIDENCE
+                        for _, conf in recognized for c in conf)
+        self.fileStatus = f"Recognized {len(words)} words in {path}, {uncertain} uncertain glyphs"
+
+    def cancelImport(self):
+        """
+        Stop an import, words already inserted stay and can be undone
+        """
+        imp = self.textImport
+        self.textImport = None
+        if imp.wordIdx is None:
+            self.fileStatus = f"Cancelled opening {imp.source}"
+        else:
+            self.fileStatus = f"Cancelled after {imp.count} words"
+
+    def openDoc(self, path: str):
+        if path.endswith(".txt"):
+            with open(path, encoding="utf-8") as f:
+                self.textImport = TextImport(f.read(), None, path)
+            return
+
+        if path.lower().endswith(IMAGE_EXTS):
+            # needs numpy, which the rest of the editor doesn't
+            from recognize import recognizeFile
+            future = self._recognizer.submit(recognizeFile, path)
+            if self.wordDB.wake is not None:
+                wake = self.wordDB.wake
+                future.add_done_callback(lambda _: wake())
+            self.recognizing = (path, future)
+            self.fileStatus = f"Recognizing {path} {PENDING_TEXT}"
+            return
+
+        doc = loadDocument(path)
+        try:
+            # words are decoded while rendering, where errors aren't caught
+            doc.validate(path)
+        except DocumentError:
+            doc.close()
+            raise
+        if len(doc) == 0:
+            doc.close()
+            self.setWords([])
+            return
+        self._closeDoc()
+        # words are only decoded once they're shown or edited
+        self._mappedDoc = doc
+        self.words = WordBuffer(source=doc, resolve=self.wordDB.getWord)
+        self.docVersion += 1
+        self.history.clear()
+        self.journal.compactFrom(path)
+        self.fileStatus = f"Opened {len(doc)} words from {path}"
+
+    def getText(self) -> str:
+        """
+        Get the full translated text, wrapped the same as the data window
+        """
+        # rewrapped when the data window is resized too
+        key = (self.docVersion, self.dataWidth)
+        if self._textKey != key:
+            self.layout.update(self.words, self.dataWidth, self.docVersion)
+            # only lines the layout rebuilt need their text rebuilt
+            for line in self.layout.lines:
+                if line.text is None:
+                    text = []
+                    for wIdx in range(line.start, line.start + len(line.xs)):
+                        word = self.words[wIdx]
+                        if len(word.value) > 0:
+                            text.append(word.value)
+                        elif self.wordDB.isPending(word.getKey()):
+                            text.append(PENDING_TEXT)
+                        else:
+                            text.append(word.getSoundStr())
+                    line.text = " ".join(text)
+            self._text = " \n ".join(line.text for line in self.layout.lines)
+            self._textKey = key
+        return self._text
+
+    def render(self) -> bool:
+        self.wordDB.poll()
+        if self.textImport is not None:
+            self._stepImport()
+        if self.recognizing is not None:
+            self._recognized()
+        # an import compacts once it's done, not every compactEvery words
+        if self.textImport is None and self.journal.compactDue():
+            self.journal.compact(self.words.snapshot())
+        self.journal.tick()
+
+        if im.Begin("Input"):
+            im.CheckBox("Word Line", self.wordLine)
+            im.SameLine()
+            im.BeginDisabled(not glyph_render.atlasAvailable())
+            if im.CheckBox("Texture atlas", self.atlas):
+                glyph_render.useAtlas = self.atlas.val
+            im.EndDisabled()
+
+            wl = im.GetWindowDrawList()
+
+            # These indices should never be invalid, error if they are
+            selectedWord = self.words[self.selectedWordIdx]
+            selectedGlyph = selectedWord.glyph(self.selectedGlyphIdx)
+
+            im.Text("Consonants")
+            if im.BeginTable("Letter_Table", 12, TABLE_FLAGS):
+                for con in Cons:
+                    im.TableNextColumn()
+                    im.Text(con.name)
+                    try:
+                        example = CONS_EXAMPLES[con]
+                    except KeyError:
+                        example = ""
+                    im.BeginDisabled()
+                    im.Text(example)
+                    im.EndDisabled()
+                    hl = selectedGlyph.cons == con
+                    if glyphButton(f"add{con.name}", Glyph(con), wl,
+                                   self.wordLine.val, EDITOR_SCALE, hl, 10):
+                        self.toggleCons(con)
+                        selectedGlyph = selectedWord.glyph(
+                            self.selectedGlyphIdx)
+
+                im.EndTable()
+
+            im.Dummy(im.Vec2(0, 10))
+            im.Text("Vowels")
+            # same ID so settings are shared
+            if im.BeginTable("Letter_Table", 12, TABLE_FLAGS):
+                for vow in Vowel:
+                    im.TableNextColumn()
+                    im.Text(vow.name)
+                    im.BeginDisabled()
+                    im.Text(VOW_EXAMPLES[vow])
+                    im.EndDisabled()
+                    hl = selectedGlyph.vowel == vow
+                    if glyphButton(f"add{vow.name}", Glyph(None, vow), wl,
+                                   self.wordLine.val, EDITOR_SCALE, hl, 10):
+                        self.toggleVowel(vow)
+                        selectedGlyph = selectedWord.glyph(
+                            self.selectedGlyphIdx)
+
+                im.TableNextColumn()
+                im.Text("Dot")
+                if glyphButton(f"addDot", Glyph(None, None,
+                                                True), wl, self.wordLine.val,
+                               EDITOR_SCALE, selectedGlyph.dot, 10):
+                    self.toggleDot()
+                im.EndTable()
+
+        im.End()
+
+        if im.Begin("Data"):
+            dl = im.GetWindowDrawList()
+            wPos = im.GetWindowPos()
+            wSize = im.GetWindowSize()
+            yScroll = im.GetScrollY()
+            origin = im.Vec2(wPos.x + DATA_MARGIN_X, wPos.y + DATA_MARGIN_Y)
+
+            self.dataWidth = wSize.x - DATA_MARGIN_X
+            self.layout.update(self.words, self.dataWidth, self.docVersion)
+
+            top = yScroll - DATA_MARGIN_Y
+            for line in self.layout.visibleLines(top, top + wSize.y):
+                pos = im.Vec2(0, origin.y + line.y - yScroll)
+                for wIdx, x in line.words:
+                    pos.x = origin.x + x
+                    word = self.words[wIdx]
+                    for gIdx, g in enumerate(word.glyphs):
+                        im.SetCursorScreenPos(pos)
+                        selected = wIdx == self.selectedWordIdx and gIdx == self.selectedGlyphIdx
+                        if glyphButton(f"select{wIdx},{gIdx}", g, dl,
+                                       self.wordLine.val, 1.0, selected):
+
+                            self.selectedWordIdx = wIdx
+                            self.selectedGlyphIdx = gIdx
+                        pos.x += GLYPH_TOTAL_X
+
+            # Extend the window to the full layout height so culled lines can be scrolled to
+            im.SetCursorPos(im.Vec2(0, DATA_MARGIN_Y + self.layout.height))
+            im.Dummy(im.Vec2(0, 0))
+
+        im.End()
+
+        insert = False
+        preventInput = False
+
+        if im.Begin("Lookup"):
+            dl = im.GetWindowDrawList()
+            if im.InputText("Lookup", self.lookupText):
+                self.updateLookup()
+            if im.IsItemFocused():
+                preventInput = True
+                if im.IsKeyPressed(im.ImKey.DownArrow):
+                    self.selectLookup(self.lookupSel + 1)
+                elif im.IsKeyPressed(im.ImKey.UpArrow):
+                    self.selectLookup(self.lookupSel - 1)
+            if im.IsItemDeactivated() and im.IsKeyPressed(im.ImKey.Enter):
+                insert = True
+                im.SetKeyboardFocusHere(-1)
+
+            im.BeginDisabled(self.lookupWord is None
+                             or self.textImport is not None)
+            if (im.Button("Insert") or insert) and self.textImport is None:
+                temp = self.words[self.selectedWordIdx]
+                if not temp.isEmpty():
+                    self.insertWord(self.selectedWordIdx + 1,
+                                    self.lookupWord.copy())
+                else:
+                    self.replaceWord(self.selectedWordIdx,
+                                     self.lookupWord.copy())
+                    self.insertWord(len(self.words), Word(Glyph()))
+                self.selectedWordIdx += 1
+                self.selectedGlyphIdx = 0
+                self.lookupText.set("")
+                self.updateLookup()
+            im.EndDisabled()
+
+            if self.lookupWord is not None:
+                im.Text(self.lookupWord.getSoundStr())
+                pos = im.GetCursorPos()
+                for gIdx, g in enumerate(self.lookupWord.glyphs):
+                    im.SetCursorPos(pos)
+                    glyphButton(f"lookup{gIdx}", g, dl, self.wordLine.val,
+                                1.0, False)
+                    pos.x += GLYPH_TOTAL_X
+
+            if self.lookupPending:
+                im.TextDisabled(PENDING_TEXT)
+            for idx, (value, _) in enumerate(self.lookupResults):
+                if im.Selectable(f"{value}##candidate{idx}",
+                                 idx == self.lookupSel):
+                    self.selectLookup(idx)
+        im.End()
+
+        if im.Begin("Translation"):
+            im.Text(selectedWord.getSoundStr())
+            if self.transText.copy() != selectedWord.value:
+                self.transText.set(selectedWord.value)
+            hint = PENDING_TEXT if self.wordDB.isPending(
+                selectedWord.getKey()) else ""
+            if im.InputTextWithHint("Trans", hint, self.transText):
+                self.setValue(self.selectedWordIdx, self.transText.copy())
+            if im.IsItemDeactivated():
+                self.wordDB.flush()
+            if im.IsItemFocused():
+                preventInput = True
+
+            im.Text(self.getText())
+        im.End()
+
+        if im.Begin("File"):
+            im.InputText("Path", self.docPath)
+            if im.IsItemFocused():
+                preventInput = True
+            path = self.docPath.copy().strip()
+            importing = self.textImport is not None
+            busy = importing or self.recognizing is not None
+            im.BeginDisabled(len(path) == 0 or busy)
+            try:
+                if im.Button("Save"):
+                    self.saveDoc(path)
+                im.SameLine()
+                if im.Button("Open"):
+                    self.openDoc(path)
+            except (OSError, ValueError, ImportError, RuntimeError) as err:
+                self.fileStatus = f"Error: {err}"
+            im.EndDisabled()
+
+            im.BeginDisabled(busy)
+            if im.Button("Paste"):
+                self.pasteText(im.GetClipboardText())
+            im.SameLine()
+            if im.Button("Copy word"):
+                self.copyText(False)
+            im.SameLine()
+            if im.Button("Copy all"):
+                self.copyText(True)
+            im.EndDisabled()
+
+            if importing:
+                imp = self.textImport
+                im.ProgressBar(imp.progress,
+                               overlay=f"{imp.count} words")
+                if im.Button("Cancel"):
+                    self.cancelImport()
+            im.Text(self.fileStatus)
+        im.End()
+
+        if im.Begin("Pattern"):
+            im.Text("Matches for the selected word, empty glyphs match anything")
+            im.CheckBox("Exact glyphs", self.patternExact)
+            im.SameLine()
+            im.CheckBox("Longer words", self.patternPrefix)
+            self.updatePattern(selectedWord)
+            if self.patternPending:
+                im.TextDisabled(PENDING_TEXT)
+
+            for idx, (value, key) in enumerate(self.patternResults):
+                if im.Selectable(f"{value}    {strFromKey(key)}##match{idx}"):
+                    # replace the selected word with the match
+                    match = Word.fromKey(key, value)
+                    self.replaceWord(self.selectedWordIdx, match)
+                    self.selectedGlyphIdx = min(self.selectedGlyphIdx,
+                                                len(match) - 1)
+        im.End()
+
+        if self.textImport is not None:
+            # word indices have to stay put until it's done
+            preventInput = True
+        elif im.IsKeyPressed(im.ImKey.Enter) and not insert:
+            self.insertWord(self.selectedWordIdx + 1, Word(Glyph()))
+            self.selectedWordIdx += 1
+            self.selectedGlyphIdx = 0
+
+        io = im.GetIO()
+        if not preventInput:
+            if io.KeyCtrl and im.IsKeyPressed(im.ImKey.V):
+                self.pasteText(im.GetClipboardText())
+            elif io.KeyCtrl and im.IsKeyPressed(im.ImKey.C):
+                self.copyText(io.KeyShift)
+            elif io.KeyCtrl and im.IsKeyPressed(im.ImKey.Z):
+                if io.KeyShift:
+                    self.redo()
+                else:
+                    self.undo()
+            elif io.KeyCtrl and im.IsKeyPressed(im.ImKey.Y):
+                self.redo()
+            elif im.IsKeyPressed(im.ImKey.Space):
+                self.insertGlyph(self.selectedWordIdx,
+                                 self.selectedGlyphIdx + 1)
+                self.selectedGlyphIdx += 1
+            elif im.IsKeyPressed(im.ImKey.Backspace):
+                if len(selectedWord) > 1:
+                    self.deleteGlyph(self.selectedWordIdx,
+                                     self.selectedGlyphIdx)
+                    if self.selectedGlyphIdx > 0:
+                        self.selectedGlyphIdx -= 1
+                elif len(self.words) > 1:
+                    self.deleteWord(self.selectedWordIdx)
+                    if self.selectedWordIdx > 0:
+                        self.selectedWordIdx -= 1
+                        self.selectedGlyphIdx = len(
+                            self.words[self.selectedWordIdx]) - 1
+                else:
+                    self.replaceWord(0, Word(Glyph()))
+            elif im.IsKeyPressed(im.ImKey.RightArrow):
+                self.words.moveRight()
+            elif im.IsKeyPressed(im.ImKey.LeftArrow):
+                self.words.moveLeft()
+
+        # everything edited this frame is undone together,
+        # and a paste as a whole
+        if self.textImport is None:
+            self.history.endGroup()
+        glyph_render.uploadAtlases()
+        # one lookup for every word decoded or edited this frame
+        self.wordDB.dispatch()
+        return False
+
+
+def run():
+    s = State()
+
+    def init():
+        # wake the idle loop when DB results are ready
+        s.wordDB.wake = glfw.PostEmptyEvent
+
+    window_mainloop("Trunic Translate",
+                    s.render,
+                    init=init,
+                    cleanup=s.close,
+                    idle=IdleConfig(pending=s.pending))
@@ -0,0 +1,151 @@
+"""
+Document edits as data, so they can be journaled, replayed and undone
+"""
+import enum
+import struct
+import sys
+import zlib
+from array import array
+from typing import Iterator, List, Tuple
+
+from glyphs import Word, Glyph, GLYPH_CODE_TYPE
+
+# body length, CRC32 of body
+EDIT_FRAME = struct.Struct("<II")
+# op, word index, glyph index, code count
+_BODY = struct.Struct("<BIIH")
+
+
+class EditOp(enum.IntEnum):
+    # codes[0] is the new glyph code at wordIdx, glyphIdx
+    SET_GLYPH = 1
+    INSERT_GLYPH = 2
+    DELETE_GLYPH = 3
+    # codes is the new word at wordIdx
+    INSERT_WORD = 4
+    DELETE_WORD = 5
+    REPLACE_WORD = 6
+    SET_VALUE = 7
+
+
+class Edit:
+    """
+    A single change to a document.
+    value is the word's translation after the edit, unused by DELETE_WORD
+    """
+
+    __slots__ = ("op", "wordIdx", "glyphIdx", "codes", "value")
+
+    def __init__(self,
+                 op: EditOp,
+                 wordIdx: int,
+                 glyphIdx: int = 0,
+                 codes: Tuple[int, ...] = (),
+                 value: str = "") -> None:
+        self.op = op
+        self.wordIdx = wordIdx
+        self.glyphIdx = glyphIdx
+        self.codes = codes
+        self.value = value
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Edit) and (
+            self.op, self.wordIdx, self.glyphIdx, self.codes,
+            self.value) == (other.op, other.wordIdx, other.glyphIdx,
+                            other.codes, other.value)
+
+    def __repr__(self) -> str:
+        return f"Edit({self.op.name}, {self.wordIdx}, {self.glyphIdx}, {self.codes}, {self.value!r})"
+
+
+def applyEdit(words: List[Word], edit: Edit):
+    op = edit.op
+    if op == EditOp.INSERT_WORD:
+        words.insert(edit.wordIdx, Word.fromCodes(edit.codes, edit.value))
+        return
+    if op == EditOp.DELETE_WORD:
+        words.pop(edit.wordIdx)
+        return
+    if op == EditOp.REPLACE_WORD:
+        words[edit.wordIdx] = Word.fromCodes(edit.codes, edit.value)
+        return
+
+    word = words[edit.wordIdx]
+    if op == EditOp.SET_GLYPH:
+        word.setGlyph(edit.glyphIdx, Glyph.fromCode(edit.codes[0]))
+    elif op == EditOp.INSERT_GLYPH:
+        word.insertGlyph(edit.glyphIdx, Glyph.fromCode(edit.codes[0]))
+    elif op == EditOp.DELETE_GLYPH:
+        word.popGlyph(edit.glyphIdx)
+    elif op != EditOp.SET_VALUE:
+        raise ValueError(f"Unknown edit op: {op}")
+    word.value = edit.value
+
+
+def inverseOf(words: List[Word], edit: Edit) -> Edit:
+    """
+    Get the edit that undoes edit, call before applying it.
+    Only the op and indices of edit are used
+    """
+    op = edit.op
+    wIdx = edit.wordIdx
+    if op == EditOp.INSERT_WORD:
+        return Edit(EditOp.DELETE_WORD, wIdx)
+
+    word = words[wIdx]
+    if op == EditOp.DELETE_WORD:
+        return Edit(EditOp.INSERT_WORD, wIdx, 0, word.codes, word.value)
+    if op == EditOp.REPLACE_WORD:
+        return Edit(EditOp.REPLACE_WORD, wIdx, 0, word.codes, word.value)
+    if op == EditOp.SET_GLYPH:
+        return Edit(EditOp.SET_GLYPH, wIdx, edit.glyphIdx,
+                    (word.glyph(edit.glyphIdx).code, ), word.value)
+    if op == EditOp.INSERT_GLYPH:
+        return Edit(EditOp.DELETE_GLYPH, wIdx, edit.glyphIdx, (), word.value)
+    if op == EditOp.DELETE_GLYPH:
+        return Edit(EditOp.INSERT_GLYPH, wIdx, edit.glyphIdx,
+                    (word.glyph(edit.glyphIdx).code, ), word.value)
+    if op == EditOp.SET_VALUE:
+        return Edit(EditOp.SET_VALUE, wIdx, 0, (), word.value)
+    raise ValueError(f"Unknown edit op: {op}")
+
+
+def encodeEdit(edit: Edit) -> bytes:
+    """
+    Serialize an edit as a length and CRC prefixed record
+    """
+    codes = array(GLYPH_CODE_TYPE, edit.codes)
+    if sys.byteorder == "big":
+        codes.byteswap()
+    body = b"".join([
+        _BODY.pack(edit.op, edit.wordIdx, edit.glyphIdx, len(codes)),
+        codes.tobytes(),
+        edit.value.encode("utf-8")
+    ])
+    return EDIT_FRAME.pack(len(body), zlib.crc32(body)) + body
+
+
+def decodeEdit(body: bytes) -> Edit:
+    """
+    Parse the body of a record written by encodeEdit()
+    """
+    op, wordIdx, glyphIdx, numCodes = _BODY.unpack_from(body)
+    end = _BODY.size + numCodes * 2
+    codes = array(GLYPH_CODE_TYPE)
+    codes.frombytes(body[_BODY.size:end])
+    if sys.byteorder == "big":
+        codes.byteswap()
+    return Edit(EditOp(op), wordIdx, glyphIdx, tuple(codes),
+                str(body[end:], "utf-8"))
+
+
+def decodeEdits(data: bytes) -> Iterator[Edit]:
+    """
+    Parse concatenated records from trusted memory, without checking CRCs
+    """
+    pos = 0
+    while pos < len(data):
+        length, _ = EDIT_FRAME.unpack_from(data, pos)
+        pos += EDIT_FRAME.size
+        yield decodeEdit(data[pos:pos + length])
+        pos += length
@@ -0,0 +1,316 @@
+"""
+Render documents to PNG or SVG without opening a window.
+
+Words are wrapped with the same layout as the Data window, optionally with
+each word's translation under it. PNG export needs numpy, and Pillow for
+translations. SVG export has no extra dependencies.
+
+    python export.py page1.tdoc page2.tdoc -o out/ -f svg --translate
+"""
+import argparse
+import os
+import sqlite3
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Sequence, Tuple
+from xml.sax.saxutils import escape
+
+from glyphs import (Word, GLYPH_TOTAL_X, GLYPH_TOTAL_Y, GLYPH_THICK,
+                    GLYPH_DOT_RAD)
+from glyph_geometry import GLYPH_GEOMETRY, GLYPH_DOT_POS
+from layout import WordLayout, LINE_GAP
+from word_buffer import WordBuffer
+from document import loadDocument, importText
+from word_db import WordDB, WordDBError, DEFAULT_DB_PATH, upgradeDB
+
+DEFAULT_WIDTH = 1200
+MARGIN = 20
+# space for the translation under each word
+TEXT_HEIGHT = 24
+FONT_SIZE = 16
+# baseline of the translation, below the dot
+TEXT_Y = GLYPH_DOT_POS[1] + GLYPH_DOT_RAD + FONT_SIZE + 4
+
+FOREGROUND = 0
+BACKGROUND = 255
+
+
+class ExportError(Exception):
+    pass
+
+
+def layoutWords(words: Sequence[Word], width: float,
+                translate: bool) -> WordLayout:
+    """
+    Wrap words like the Data window, width is the page width at scale 1.0
+    """
+    lineHeight = GLYPH_TOTAL_Y + LINE_GAP
+    if translate:
+        lineHeight += TEXT_HEIGHT
+    layout = WordLayout(lineHeight=lineHeight)
+    layout.update(WordBuffer(words), width - 2 * MARGIN, 0)
+    return layout
+
+
+def _pageSize(layout: WordLayout, width: float,
+              scale: float) -> Tuple[int, int]:
+    return round(width * scale), round((layout.height + 2 * MARGIN) * scale)
+
+
+# --- PNG ---
+
+
+def _drawTranslations(image, words: Sequence[Word], layout: WordLayout,
+                      scale: float):
+    try:
+        from PIL import Image, ImageDraw, ImageFont
+    except ImportError:
+        raise ExportError("PNG translations need Pillow installed") from None
+    import numpy as np
+
+    img = Image.fromarray(image)
+    draw = ImageDraw.Draw(img)
+    try:
+        font = ImageFont.load_default(size=round(FONT_SIZE * scale))
+    except TypeError:
+        # older Pillow without scalable default font
+        font = ImageFont.load_default()
+    for line in layout.lines:
+        for wIdx, x in line.words:
+            value = words[wIdx].value
+            if len(value) > 0:
+                draw.text(((MARGIN + x) * scale,
+                           (MARGIN + line.y + TEXT_Y) * scale),
+                          value,
+                          fill=FOREGROUND,
+                          font=font,
+                          anchor="ls")
+    return np.asarray(img)
+
+
+def renderPNG(path: str,
+              words: Sequence[Word],
+              width: float = DEFAULT_WIDTH,
+              scale: float = 1.0,
+              wordline: bool = True,
+              translate: bool = False):
+    from raster import Canvas
+    from png_io import writePNG
+
+    layout = layoutWords(words, width, translate)
+    canvas = Canvas(*_pageSize(layout, width, scale))
+    for line in layout.lines:
+        y = (MARGIN + line.y) * scale
+        for wIdx, x in line.words:
+            x = (MARGIN + x) * scale
+            for code in words[wIdx].codes:
+                canvas.glyph(code, wordline, x, y, scale)
+                x += GLYPH_TOTAL_X * scale
+
+    image = canvas.toGray(BACKGROUND, FOREGROUND)
+    if translate:
+        image = _drawTranslations(image, words, layout, scale)
+    writePNG(path, image)
+
+
+# --- SVG ---
+
+
+def _svgGlyph(code: int, wordline: bool) -> str:
+    geom = GLYPH_GEOMETRY[code][1 if wordline else 0]
+    segs = geom.segments
+    path = " ".join(f"M{segs[i]:g} {segs[i + 1]:g}L{segs[i + 2]:g} {segs[i + 3]:g}"
+                    for i in range(0, len(segs), 4))
+    out = []
+    if len(path) > 0:
+        out.append(f'<path d="{path}"/>')
+    if geom.dot:
+        out.append(f'<circle cx="{GLYPH_DOT_POS[0]:g}" cy="{GLYPH_DOT_POS[1]:g}" '
+                   f'r="{GLYPH_DOT_RAD:g}"/>')
+    return "".join(out)
+
+
+def renderSVG(path: str,
+              words: Sequence[Word],
+              width: float = DEFAULT_WIDTH,
+              scale: float = 1.0,
+              wordline: bool = True,
+              translate: bool = False):
+    """
+    Each distinct glyph is defined once and placed with <use>
+    """
+    layout = layoutWords(words, width, translate)
+    pageW, pageH = _pageSize(layout, width, scale)
+
+    defs: Dict[int, str] = {}
+    body: List[str] = []
+    for line in layout.lines:
+        y = MARGIN + line.y
+        for wIdx, x in line.words:
+            word = words[wIdx]
+            gx = MARGIN + x
+            for code in word.codes:
+                if code not in defs:
+                    defs[code] = _svgGlyph(code, wordline)
+                if len(defs[code]) > 0:
+                    body.append(f'<use href="#g{code}" x="{gx:g}" y="{y:g}"/>')
+                gx += GLYPH_TOTAL_X
+            if translate and len(word.value) > 0:
+                body.append(f'<text x="{MARGIN + x:g}" y="{y + TEXT_Y:g}">'
+                            f'{escape(word.value)}</text>')
+
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(
+            f'<svg xmlns="http://www.w3.org/2000/svg" width="{pageW}" height="{pageH}" '
+            f'viewBox="0 0 {width:g} {pageH / scale:g}">\n')
+        f.write(f'<rect width="100%" height="100%" fill="white"/>\n')
+        f.write("<defs>\n")
+        for code, shape in defs.items():
+            if len(shape) > 0:
+                f.write(f'<g id="g{code}">{shape}</g>\n')
+        f.write("</defs>\n")
+        f.write(f'<g fill="none" stroke="black" stroke-width="{GLYPH_THICK:g}" '
+                f'stroke-linecap="round">\n')
+        f.write("\n".join(b for b in body if b.startswith("<use")))
+        f.write("\n</g>\n")
+        if translate:
+            f.write(f'<g font-family="sans-serif" font-size="{FONT_SIZE}">\n')
+            f.write("\n".join(b for b in body if b.startswith("<text")))
+            f.write("\n</g>\n")
+        f.write("</svg>\n")
+
+
+# --- batch ---
+
+RENDERERS = {"png": renderPNG, "svg": renderSVG}
+
+# Per process DB connection, opened by _initWorker
+_db: WordDB | None = None
+
+
+def _initWorker(dbPath: str | None):
+    global _db
+    if dbPath is not None and os.path.exists(dbPath):
+        _db = WordDB(dbPath, readOnly=True)
+
+
+def readWords(path: str) -> List[Word]:
+    """
+    Read a document or sound string text file,
+    filling in translations from the DB if one is open
+    """
+    if path.endswith(".txt"):
+        words = importText(path)
+    else:
+        with loadDocument(path) as doc:
+            words = list(doc)
+    if _db is not None:
+        _db.resolveWords([w for w in words if len(w.value) == 0])
+    return words
+
+
+def exportFile(args: Tuple[str, str, str, float, float, bool, bool]) -> str:
+    """
+    Render one input file, returns the output path
+    """
+    inPath, outPath, fmt, width, scale, wordline, translate = args
+    RENDERERS[fmt](outPath, readWords(inPath), width, scale, wordline,
+                   translate)
+    return outPath
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("inputs",
+                        nargs="+",
+                        help=".tdoc or sound string .txt files, or directories of them")
+    parser.add_argument("-o", "--output", default=".", help="output directory")
+    parser.add_argument("-f", "--format", choices=list(RENDERERS), default="png")
+    parser.add_argument("--width",
+                        type=float,
+                        default=DEFAULT_WIDTH,
+                        help="page width at scale 1")
+    parser.add_argument("--scale", type=float, default=1.0)
+    parser.add_argument("--no-word-line", action="store_true")
+    parser.add_argument("--translate",
+                        action="store_true",
+                        help="write each word's translation under it")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, help="word DB path")
+    parser.add_argument("-j",
+                        "--workers",
+                        type=int,
+                        default=os.cpu_count() or 1,
+                        help="number of worker processes")
+    args = parser.parse_args()
+
+    inputs = []
+    for path in args.inputs:
+        if os.path.isdir(path):
+            inputs.extend(
+                os.path.join(path, name) for name in sorted(os.listdir(path))
+                if name.endswith((".tdoc", ".txt")))
+        else:
+            inputs.append(path)
+
+    jobs = []
+    # output path -> input path, inputs with the same name would overwrite
+    # each other's output
+    outputs: Dict[str, str] = {}
+    for inPath in inputs:
+        name = os.path.splitext(os.path.basename(inPath))[0]
+        outPath = os.path.join(args.output, f"{name}.{args.format}")
+        key = os.path.normcase(os.path.abspath(outPath))
+        if key in outputs:
+            print(f"{inPath} and {outputs[key]} would both be written to "
+                  f"{outPath}",
+                  file=sys.stderr)
+            sys.exit(1)
+        outputs[key] = inPath
+        jobs.append((inPath, outPath, args.format, args.width, args.scale,
+                     not args.no_word_line, args.translate))
+
+    os.makedirs(args.output, exist_ok=True)
+
+    # migrate an old DB once here, workers only open it read only
+    dbPath = args.db if args.translate else None
+    if dbPath is not None:
+        try:
+            upgradeDB(dbPath)
+        except (WordDBError, sqlite3.Error) as err:
+            print(f"{dbPath}: {err}", file=sys.stderr)
+            sys.exit(1)
+    failed = 0
+    if args.workers <= 1 or len(jobs) <= 1:
+        _initWorker(dbPath)
+        results = []
+        for job in jobs:
+            try:
+                results.append((job[0], exportFile(job), None))
+            except Exception as err:
+                results.append((job[0], None, err))
+    else:
+        with ProcessPoolExecutor(max_workers=args.workers,
+                                 initializer=_initWorker,
+                                 initargs=(dbPath, )) as pool:
+            futures = [(job[0], pool.submit(exportFile, job)) for job in jobs]
+            results = []
+            for inPath, future in futures:
+                try:
+                    results.append((inPath, future.result(), None))
+                except Exception as err:
+                    results.append((inPath, None, err))
+
+    for inPath, outPath, err in results:
+        if err is not None:
+            failed += 1
+            print(f"{inPath}: {err}", file=sys.stderr)
+        else:
+            print(f"{inPath} -> {outPath}", file=sys.stderr)
+
+    if failed > 0:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
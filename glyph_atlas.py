@@ -0,0 +1,120 @@
+"""
+Texture atlas of pre-rasterized glyphs, so each glyph can be drawn as one
+textured quad instead of a line per part.
+Kept free of imgui, the renderer passes in the texture upload functions
+"""
+from typing import Any, Callable, Dict, List, Set, Tuple
+
+import numpy as np
+
+from glyphs import NUM_CODES, isValidCode
+from raster import GlyphStamps
+
+PAGE_SIZE = 2048
+
+# (data, width, height) -> texture
+LoadFunc = Callable[[bytes, int, int], Any]
+UnloadFunc = Callable[[Any], None]
+
+# page, then u0, v0, u1, v1
+AtlasSlot = Tuple[int, float, float, float, float]
+
+
+class GlyphAtlas:
+    """
+    Every glyph, with and without the word line, rasterized at one scale.
+    Glyphs are rasterized into pages on first request, request() returns None
+    until upload() has put them on the GPU
+    """
+
+    def __init__(self, scale: float, pageSize: int = PAGE_SIZE) -> None:
+        self.scale = scale
+        self.pageSize = pageSize
+        self._stamps = GlyphStamps(scale)
+        # glyph box plus padding, origin offset is the padding
+        self.pad = self._stamps.pad
+        self.cellW = self._stamps.width
+        self.cellH = self._stamps.height
+        self.cols = pageSize // self.cellW
+        self.rows = pageSize // self.cellH
+        if self.cols == 0 or self.rows == 0:
+            raise ValueError(f"Scale {scale} too large for atlas page")
+
+        # _key(code, wordline) -> slot, only for uploaded glyphs
+        self._slots: Dict[int, AtlasSlot] = {}
+        # rasterized but not uploaded yet
+        self._pending: Dict[int, AtlasSlot] = {}
+        # 8 bit coverage, kept so the pages can be uploaded again
+        self._pages: List[np.ndarray] = []
+        self._dirty: Set[int] = set()
+        self.textures: List[Any] = []
+        self._used = 0
+
+    @staticmethod
+    def _key(code: int, wordline: bool) -> int:
+        return code * 2 + wordline
+
+    def request(self, code: int, wordline: bool) -> AtlasSlot | None:
+        key = self._key(code, wordline)
+        slot = self._slots.get(key)
+        if slot is None and key not in self._pending:
+            self._pending[key] = self._rasterize(code, wordline)
+        return slot
+
+    def _rasterize(self, code: int, wordline: bool) -> AtlasSlot:
+        perPage = self.cols * self.rows
+        page, idx = divmod(self._used, perPage)
+        self._used += 1
+        if page == len(self._pages):
+            self._pages.append(
+                np.zeros((self.pageSize, self.pageSize), dtype=np.uint8))
+            self.textures.append(None)
+
+        row, col = divmod(idx, self.cols)
+        x = col * self.cellW
+        y = row * self.cellH
+        cell = self._pages[page][y:y + self.cellH, x:x + self.cellW]
+        cell[:] = np.rint(self._stamps.glyph(code, wordline) * 255)
+        self._dirty.add(page)
+        size = self.pageSize
+        return (page, x / size, y / size, (x + self.cellW) / size,
+                (y + self.cellH) / size)
+
+    def rasterizeAll(self):
+        """
+        Queue every valid glyph, instead of as they are requested
+        """
+        for code in range(NUM_CODES):
+            if isValidCode(code):
+                self.request(code, False)
+                self.request(code, True)
+
+    def hasPending(self) -> bool:
+        return len(self._pending) > 0
+
+    def upload(self, load: LoadFunc, unload: UnloadFunc):
+        """
+        Upload pages with newly rasterized glyphs, must be called with the
+        render context current
+        """
+        rgba = np.full((self.pageSize, self.pageSize, 4), 255, dtype=np.uint8)
+        for page in sorted(self._dirty):
+            rgba[..., 3] = self._pages[page]
+            data = rgba.tobytes()
+            old = self.textures[page]
+            self.textures[page] = load(data, self.pageSize, self.pageSize)
+            if old is not None:
+                unload(old)
+        self._dirty.clear()
+        self._slots.update(self._pending)
+        self._pending.clear()
+
+    def release(self, unload: UnloadFunc):
+        for tex in self.textures:
+            if tex is not None:
+                unload(tex)
+        self.textures = [None] * len(self.textures)
+        # everything has to be uploaded again
+        self._dirty = set(range(len(self._pages)))
+        self._pending.update(self._slots)
+        self._slots.clear()
@@ -0,0 +1,96 @@
+"""
+Precomputed line segments for drawing glyphs, shared by the renderers
+"""
+from typing import Dict, Iterable, List, Tuple
+
+from glyphs import (GlyphParts, GLYPH_PARTS, NUM_CODES, GLYPH_OUTER_Y,
+                    GLYPH_C_Y1, GLYPH_C_Y2, GLYPH_MID_Y, GLYPH_TOTAL_Y,
+                    GLYPH_X, GLYPH_TOTAL_X, WORD_LINE_Y, GLYPH_DOT_RAD)
+
+# Segment endpoints for each part, relative to the glyph's top left corner at scale 1.0
+# (x1, y1, x2, y2)
+Segment = Tuple[float, float, float, float]
+
+_C1 = (GLYPH_X, GLYPH_C_Y1)
+_C2 = (GLYPH_X, GLYPH_C_Y2)
+
+_PART_SEGMENTS: Dict[GlyphParts, Tuple[Segment, ...]] = {
+    # Vowel parts
+    GlyphParts.V1: ((0, GLYPH_OUTER_Y, GLYPH_X, 0), ),
+    GlyphParts.V2: ((GLYPH_X, 0, GLYPH_TOTAL_X, GLYPH_OUTER_Y), ),
+    GlyphParts.V3: ((0, GLYPH_OUTER_Y, 0, GLYPH_OUTER_Y + GLYPH_MID_Y), ),
+    GlyphParts.V4: ((0, GLYPH_OUTER_Y + GLYPH_MID_Y, GLYPH_X, GLYPH_TOTAL_Y), ),
+    GlyphParts.V5:
+    ((GLYPH_X, GLYPH_TOTAL_Y, GLYPH_TOTAL_X, GLYPH_TOTAL_Y - GLYPH_OUTER_Y), ),
+    # consonant parts
+    GlyphParts.C1: ((0, GLYPH_OUTER_Y, *_C1), ),
+    GlyphParts.C2: ((GLYPH_X, 0, *_C1), ),
+    GlyphParts.C3: ((*_C1, GLYPH_TOTAL_X, GLYPH_OUTER_Y), ),
+    GlyphParts.C4: ((*_C1, *_C2), ),
+    GlyphParts.C5: ((*_C2, 0, GLYPH_OUTER_Y + GLYPH_MID_Y), ),
+    GlyphParts.C6: ((*_C2, GLYPH_X, GLYPH_TOTAL_Y), ),
+    GlyphParts.C7: ((*_C2, GLYPH_TOTAL_X, GLYPH_OUTER_Y + GLYPH_MID_Y), ),
+    GlyphParts.DOT: (),
+}
+
+# Parts that change shape when the word line is drawn
+_WORDLINE_SEGMENTS: Dict[GlyphParts, Tuple[Segment, ...]] = {
+    # The vertical vowel line is broken around the consonant stem
+    GlyphParts.V3: (
+        (0, GLYPH_OUTER_Y, 0, WORD_LINE_Y),
+        (0, GLYPH_C_Y2, 0, GLYPH_OUTER_Y + GLYPH_MID_Y),
+    ),
+    GlyphParts.C4: ((*_C1, GLYPH_X, WORD_LINE_Y), ),
+}
+
+_WORD_LINE_SEGMENT: Segment = (0, WORD_LINE_Y, GLYPH_TOTAL_X, WORD_LINE_Y)
+
+# center of the dot, at scale 1.0
+GLYPH_DOT_POS = (GLYPH_X, GLYPH_TOTAL_Y + GLYPH_DOT_RAD)
+
+
+class GlyphGeometry:
+    """
+    Precomputed drawing data for a single glyph in one word line mode.
+    Segments are flattened to x1, y1, x2, y2 quads in unscaled coordinates
+    """
+
+    __slots__ = ("segments", "dot")
+
+    def __init__(self, parts: Iterable[GlyphParts], wordline: bool) -> None:
+        segs: List[float] = []
+        if wordline:
+            segs.extend(_WORD_LINE_SEGMENT)
+
+        self.dot = False
+        for p in parts:
+            if p == GlyphParts.DOT:
+                self.dot = True
+                continue
+            if wordline and p in _WORDLINE_SEGMENTS:
+                partSegs = _WORDLINE_SEGMENTS[p]
+            else:
+                partSegs = _PART_SEGMENTS[p]
+            for s in partSegs:
+                segs.extend(s)
+
+        self.segments: Tuple[float, ...] = tuple(segs)
+
+
+# Indexed by glyph code, value is (no word line, word line).
+# None for invalid codes
+GLYPH_GEOMETRY: List[Tuple[GlyphGeometry, GlyphGeometry] | None] = [
+    None
+] * NUM_CODES
+
+
+def _buildGeometry():
+    for code, parts in enumerate(GLYPH_PARTS):
+        if len(parts) > 0 or code == 0:
+            GLYPH_GEOMETRY[code] = (
+                GlyphGeometry(parts, False),
+                GlyphGeometry(parts, True),
+            )
+
+
+_buildGeometry()
@@ -0,0 +1,99 @@
+"""
+ImGui rendering backend for glyphs.
+Glyphs are drawn from a texture atlas at ATLAS_SCALES when NumPy is
+available, and as vector lines otherwise
+"""
+from typing import Dict
+
+import imgui as im
+
+from glyphs import Glyph, GLYPH_THICK, GLYPH_DOT_RAD
+from glyph_geometry import GLYPH_GEOMETRY, GLYPH_DOT_POS
+
+GLYPH_COL = im.ColorConvertFloat4ToU32(im.Vec4(1.0, 1.0, 1.0, 1))
+
+# scales drawn from the atlas, anything else falls back to lines
+ATLAS_SCALES = (0.5, 1.0)
+
+try:
+    from glyph_atlas import GlyphAtlas
+except ImportError:
+    # numpy not installed
+    GlyphAtlas = None
+
+_atlases: Dict[float, 'GlyphAtlas'] = {}
+useAtlas = GlyphAtlas is not None
+
+
+def atlasAvailable() -> bool:
+    return GlyphAtlas is not None
+
+
+def _loadTexture(data: bytes, width: int, height: int) -> im.Texture:
+    return im.LoadTexture(data, width, height, 4)
+
+
+def renderGlyph(dl: im.ImDrawList,
+                glyph: Glyph,
+                pos: im.Vec2,
+                wordline: bool,
+                scale: float = 1.0):
+    if useAtlas and scale in ATLAS_SCALES:
+        atlas = _atlases.get(scale)
+        if atlas is None:
+            atlas = GlyphAtlas(scale)
+            # every glyph up front, so each page is uploaded once
+            atlas.rasterizeAll()
+            _atlases[scale] = atlas
+        slot = atlas.request(glyph.code, wordline)
+        if slot is not None:
+            page, u0, v0, u1, v1 = slot
+            # snap to whole pixels so the texture isn't resampled
+            x = round(pos.x) - atlas.pad
+            y = round(pos.y) - atlas.pad
+            dl.AddImage(atlas.textures[page], im.Vec2(x, y),
+                        im.Vec2(x + atlas.cellW, y + atlas.cellH),
+                        im.Vec2(u0, v0), im.Vec2(u1, v1), GLYPH_COL)
+            return
+        # not uploaded yet, draw as lines this frame
+
+    renderGlyphLines(dl, glyph, pos, wordline, scale)
+
+
+def renderGlyphLines(dl: im.ImDrawList,
+                     glyph: Glyph,
+                     pos: im.Vec2,
+                     wordline: bool,
+                     scale: float = 1.0):
+    geom = GLYPH_GEOMETRY[glyph.code][1 if wordline else 0]
+    x = pos.x
+    y = pos.y
+    thick = GLYPH_THICK * scale
+    segs = geom.segments
+
+    for i in range(0, len(segs), 4):
+        dl.AddLine(im.Vec2(x + segs[i] * scale, y + segs[i + 1] * scale),
+                   im.Vec2(x + segs[i + 2] * scale, y + segs[i + 3] * scale),
+                   GLYPH_COL, thick)
+
+    if geom.dot:
+        dl.AddCircle(im.Vec2(x + GLYPH_DOT_POS[0] * scale,
+                             y + GLYPH_DOT_POS[1] * scale),
+                     GLYPH_DOT_RAD * scale,
+                     GLYPH_COL,
+                     thickness=thick)
+
+
+def uploadAtlases():
+    """
+    Upload glyphs first requested this frame, call once per frame after drawing
+    """
+    for atlas in _atlases.values():
+        if atlas.hasPending():
+            atlas.upload(_loadTexture, im.UnloadTexture)
+
+
+def releaseAtlases():
+    for atlas in _atlases.values():
+        atlas.release(im.UnloadTexture)
+    _atlases.clear()
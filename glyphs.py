@@ -1,7 +1,8 @@
 import enum
-from typing import List, Dict
-
-import imgui as im
+import re
+import sys
+from array import array
+from typing import List, Dict, Iterable, Iterator, Tuple
 
 
 class GlyphParts(enum.IntEnum):
@@ -277,7 +278,6 @@ GLYPH_TOTAL_X = GLYPH_X * 2
 
 WORD_LINE_Y = GLYPH_TOTAL_Y / 2
 
-GLYPH_COL = im.ColorConvertFloat4ToU32(im.Vec4(1.0, 1.0, 1.0, 1))
 GLYPH_THICK = 3
 
 GLYPH_DOT_RAD = 5
@@ -286,200 +286,433 @@ SOUND_DELIM = "`"
 CHAR_DELIM = "|"
 
 
+# Glyph codes pack a glyph into a small int:
+# bits 0-4 consonant value, bits 5-9 vowel value, bit 10 dot.
+# Enum values start at 1, so 0 means "not set"
+CODE_CONS_MASK = 0x1F
+CODE_VOWEL_SHIFT = 5
+CODE_VOWEL_MASK = 0x1F << CODE_VOWEL_SHIFT
+CODE_DOT = 1 << 10
+NUM_CODES = CODE_DOT << 1
+
+# array typecode used to store glyph codes
+GLYPH_CODE_TYPE = "H"
+
+_CONS_BY_VALUE: List[Cons | None] = [None] * (CODE_CONS_MASK + 1)
+for _c in Cons:
+    _CONS_BY_VALUE[_c.value] = _c
+
+_VOWEL_BY_VALUE: List[Vowel | None] = [None] * (CODE_CONS_MASK + 1)
+for _v in Vowel:
+    _VOWEL_BY_VALUE[_v.value] = _v
+
+
+def packGlyph(cons: Cons | None, vowel: Vowel | None, dot: bool) -> int:
+    code = 0
+    if cons is not None:
+        code = cons.value
+    if vowel is not None:
+        code |= vowel.value << CODE_VOWEL_SHIFT
+    if dot:
+        code |= CODE_DOT
+    return code
+
+
+def unpackGlyph(code: int) -> Tuple[Cons | None, Vowel | None, bool]:
+    return (_CONS_BY_VALUE[code & CODE_CONS_MASK],
+            _VOWEL_BY_VALUE[(code & CODE_VOWEL_MASK) >> CODE_VOWEL_SHIFT],
+            bool(code & CODE_DOT))
+
+
+def isValidCode(code: int) -> bool:
+    return 0 <= code < NUM_CODES and _VALID_CODES[code] == 1
+
+
+def partMask(part: GlyphParts) -> int:
+    return 1 << (part.value - 1)
+
+
+# 13 bit GlyphParts mask for each glyph code, 0 for invalid codes
+GLYPH_MASKS: List[int] = [0] * NUM_CODES
+
+# The parts of each glyph code, empty for invalid codes
+GLYPH_PARTS: List[Tuple[GlyphParts, ...]] = [()] * NUM_CODES
+
+_VALID_CODES = bytearray(NUM_CODES)
+
+# code -> interned sound string, None for invalid codes
+_CODE_STRS: List[str | None] = [None] * NUM_CODES
+# sound string -> code.
+# A dot without both a consonant and a vowel isn't written in the sound string,
+# so those glyphs share a string with (and decode to) the glyph without the dot
+_STR_CODES: Dict[str, int] = {}
+# code -> the code its sound string decodes to, used for word keys
+# so words match exactly when their sound strings do
+_KEY_CODES = array(GLYPH_CODE_TYPE, bytes(NUM_CODES * 2))
+
+
+def _consSound(cons: Cons) -> str:
+    if cons == Cons.TH_HARD:
+        return "TH(hard)"
+    elif cons == Cons.TH_SOFT:
+        return "TH(soft)"
+    else:
+        return cons.name
+
+
+def _glyphSoundStr(cons: Cons | None, vowel: Vowel | None, dot: bool) -> str:
+    out = []
+    if dot:
+        if vowel:
+            out.append(vowel.name)
+        if cons:
+            out.append(_consSound(cons))
+    else:
+        if cons:
+            out.append(_consSound(cons))
+        if vowel:
+            out.append(vowel.name)
+    return SOUND_DELIM.join(out)
+
+
+def _buildTables():
+    for cons in (None, *Cons):
+        consParts = cons.getParts() if cons is not None else []
+        for vowel in (None, *Vowel):
+            vowelParts = vowel.getParts() if vowel is not None else []
+            for dot in (False, True):
+                parts = consParts + vowelParts
+                if dot:
+                    parts.append(GlyphParts.DOT)
+
+                code = packGlyph(cons, vowel, dot)
+                mask = 0
+                for p in parts:
+                    mask |= partMask(p)
+                GLYPH_MASKS[code] = mask
+                GLYPH_PARTS[code] = tuple(parts)
+                _VALID_CODES[code] = 1
+
+                soundStr = sys.intern(_glyphSoundStr(cons, vowel, dot))
+                _CODE_STRS[code] = soundStr
+                # codes are visited without the dot first, so those win
+                _STR_CODES.setdefault(soundStr, code)
+
+    for code in range(NUM_CODES):
+        if _VALID_CODES[code]:
+            _KEY_CODES[code] = _STR_CODES[_CODE_STRS[code]]
+
+
+_buildTables()
+
+
 class Glyph:
+    """
+    Immutable wrapper around a glyph code.
+    Use the with*() methods to get a modified glyph
+    """
+
+    __slots__ = ("code", )
 
     def __init__(self,
                  cons: Cons | None = None,
                  vowel: Vowel | None = None,
                  dot: bool = False) -> None:
-        self.cons: Cons | None = cons
-        self.vowel: Vowel | None = vowel
-        self.dot = dot
-
-        self._parts: List[GlyphParts] | None = None
+        self.code = packGlyph(cons, vowel, dot)
+
+    @staticmethod
+    def fromCode(code: int) -> 'Glyph':
+        return _GLYPHS[code]
+
+    @property
+    def cons(self) -> Cons | None:
+        return _CONS_BY_VALUE[self.code & CODE_CONS_MASK]
+
+    @property
+    def vowel(self) -> Vowel | None:
+        return _VOWEL_BY_VALUE[(self.code & CODE_VOWEL_MASK) >>
+                               CODE_VOWEL_SHIFT]
+
+    @property
+    def dot(self) -> bool:
+        return bool(self.code & CODE_DOT)
+
+    @property
+    def mask(self) -> int:
+        return GLYPH_MASKS[self.code]
+
+    def withCons(self, cons: Cons | None) -> 'Glyph':
+        code = self.code & ~CODE_CONS_MASK
+        if cons is not None:
+            code |= cons.value
+        return _GLYPHS[code]
+
+    def withVowel(self, vowel: Vowel | None) -> 'Glyph':
+        code = self.code & ~CODE_VOWEL_MASK
+        if vowel is not None:
+            code |= vowel.value << CODE_VOWEL_SHIFT
+        return _GLYPHS[code]
+
+    def withDot(self, dot: bool) -> 'Glyph':
+        if dot:
+            return _GLYPHS[self.code | CODE_DOT]
+        return _GLYPHS[self.code & ~CODE_DOT]
 
     def copy(self) -> 'Glyph':
-        return Glyph(self.cons, self.vowel, self.dot)
-
-    def invalidate(self):
-        self._parts = None
-
-    def render(self,
-               dl: im.ImDrawList,
-               pos: im.Vec2,
-               wordline: bool,
-               scale: float = 1.0):
-        if self._parts is None:
-            self._parts = []
-
-            if self.cons is not None:
-                self._parts.extend(self.cons.getParts())
-            if self.vowel is not None:
-                self._parts.extend(self.vowel.getParts())
-            if self.dot:
-                self._parts.append(GlyphParts.DOT)
-
-        # precompute consonant vertices
-        c1 = im.Vec2(pos.x + (GLYPH_X * scale), pos.y + (GLYPH_C_Y1 * scale))
-        c2 = im.Vec2(c1.x, pos.y + (GLYPH_C_Y2 * scale))
-
-        if wordline:
-            w1 = im.Vec2(pos.x, pos.y + (WORD_LINE_Y * scale))
-            w2 = im.Vec2(pos.x + GLYPH_TOTAL_X * scale, w1.y)
-            dl.AddLine(w1, w2, GLYPH_COL, GLYPH_THICK * scale)
-
-        for p in self._parts:
-            match p:
-            # Vowel parts
-                case GlyphParts.V1:
-                    v1 = im.Vec2(pos.x, pos.y + (GLYPH_OUTER_Y * scale))
-                    v2 = im.Vec2(pos.x + (GLYPH_X * scale), pos.y)
-                case GlyphParts.V2:
-                    v1 = im.Vec2(pos.x + (GLYPH_X * scale), pos.y)
-                    v2 = im.Vec2(v1.x + (GLYPH_X * scale),
-                                 v1.y + (GLYPH_OUTER_Y * scale))
-                case GlyphParts.V3:
-                    v1 = im.Vec2(pos.x, pos.y + (GLYPH_OUTER_Y * scale))
-                    v2 = im.Vec2(pos.x, v1.y + (GLYPH_MID_Y * scale))
-                    if wordline:
-                        v3 = im.Vec2(pos.x, pos.y + (WORD_LINE_Y * scale))
-
-                        dl.AddLine(im.Vec2(pos.x, c2.y), v2, GLYPH_COL,
-                                   GLYPH_THICK * scale)
-
-                        v2 = v3
-
-                case GlyphParts.V4:
-                    v1 = im.Vec2(pos.x,
-                                 pos.y + (GLYPH_OUTER_Y + GLYPH_MID_Y) * scale)
-                    v2 = im.Vec2(pos.x + GLYPH_X * scale,
-                                 v1.y + GLYPH_OUTER_Y * scale)
-                case GlyphParts.V5:
-                    v1 = im.Vec2(pos.x + GLYPH_X * scale,
-                                 pos.y + GLYPH_TOTAL_Y * scale)
-                    v2 = im.Vec2(v1.x + GLYPH_X * scale,
-                                 v1.y - GLYPH_OUTER_Y * scale)
-                # consonant parts
-                case GlyphParts.C1:
-                    v1 = im.Vec2(pos.x, pos.y + GLYPH_OUTER_Y * scale)
-                    v2 = c1
-                case GlyphParts.C2:
-                    v1 = im.Vec2(pos.x + GLYPH_X * scale, pos.y)
-                    v2 = c1
-                case GlyphParts.C3:
-                    v1 = c1
-                    v2 = im.Vec2(v1.x + GLYPH_X * scale,
-                                 pos.y + GLYPH_OUTER_Y * scale)
-                case GlyphParts.C4:
-                    v1 = c1
-                    if wordline:
-                        v2 = im.Vec2(v1.x, pos.y + WORD_LINE_Y * scale)
-                    else:
-                        v2 = c2
-                case GlyphParts.C5:
-                    v1 = c2
-                    v2 = im.Vec2(pos.x,
-                                 pos.y + (GLYPH_OUTER_Y + GLYPH_MID_Y) * scale)
-                case GlyphParts.C6:
-                    v1 = c2
-                    v2 = im.Vec2(v1.x, pos.y + GLYPH_TOTAL_Y * scale)
-                case GlyphParts.C7:
-                    v1 = c2
-                    v2 = im.Vec2(v1.x + GLYPH_X * scale,
-                                 pos.y + (GLYPH_OUTER_Y + GLYPH_MID_Y) * scale)
-                case GlyphParts.DOT:
-                    v1 = im.Vec2(
-                        pos.x + GLYPH_X * scale,
-                        pos.y + (GLYPH_TOTAL_Y + GLYPH_DOT_RAD) * scale)
-                    dl.AddCircle(v1,
-                                 GLYPH_DOT_RAD * scale,
-                                 GLYPH_COL,
-                                 thickness=GLYPH_THICK * scale)
-                    return
-
-                case _:
-                    pass
-
-            dl.AddLine(v1, v2, GLYPH_COL, GLYPH_THICK * scale)
-
-    def _getConsSound(self) -> str:
-        if self.cons == Cons.TH_HARD:
-            return "TH(hard)"
-        elif self.cons == Cons.TH_SOFT:
-            return "TH(soft)"
-        else:
-            return self.cons.name
+        # Glyphs are immutable
+        return self
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Glyph):
+            return NotImplemented
+        return self.code == other.code
+
+    def __hash__(self) -> int:
+        return self.code
+
+    def __repr__(self) -> str:
+        return f"Glyph({self.cons!r}, {self.vowel!r}, {self.dot})"
 
     def getSoundStr(self) -> str:
-        out = []
-        if self.dot:
-            if self.vowel:
-                out.append(self.vowel.name)
-            if self.cons:
-                out.append(self._getConsSound())
-        else:
-            if self.cons:
-                out.append(self._getConsSound())
-            if self.vowel:
-                out.append(self.vowel.name)
-        return SOUND_DELIM.join(out)
+        return _CODE_STRS[self.code]
 
     def isEmpty(self) -> bool:
-        return self.cons is None and self.vowel is None and not self.dot
+        return self.code == 0
+
+
+def _makeGlyph(code: int) -> Glyph:
+    g = Glyph.__new__(Glyph)
+    g.code = code
+    return g
+
+
+# Shared instances, one per code
+_GLYPHS: List[Glyph] = [_makeGlyph(code) for code in range(NUM_CODES)]
 
 
 class Word:
+    """
+    A sequence of glyph codes plus its translation.
+    The sound string and code tuple are cached, glyphs must only be changed
+    through the methods here so the caches stay valid
+    """
+
+    __slots__ = ("_codes", "value", "_soundStr", "_codeTuple", "_key")
 
     def __init__(self, *glyphs: Glyph) -> None:
-        self.glyphs: List[Glyph] = list(glyphs)
-        self.value = im.StrRef(50)
+        self._codes = array(GLYPH_CODE_TYPE, [g.code for g in glyphs])
+        self.value = ""
+        self._soundStr: str | None = None
+        self._codeTuple: Tuple[int, ...] | None = None
+        self._key: bytes | None = None
+
+    @staticmethod
+    def fromCodes(codes: Iterable[int], value: str = "") -> 'Word':
+        return Word._wrap(array(GLYPH_CODE_TYPE, codes), value)
+
+    @staticmethod
+    def fromKey(key: bytes, value: str = "") -> 'Word':
+        return Word._wrap(codesFromKey(key), value)
+
+    @staticmethod
+    def _wrap(codes: array, value: str = "") -> 'Word':
+        w = Word.__new__(Word)
+        w._codes = codes
+        w.value = value
+        w._soundStr = None
+        w._codeTuple = None
+        w._key = None
+        return w
+
+    def _invalidate(self):
+        self._soundStr = None
+        self._codeTuple = None
+        self._key = None
+
+    @property
+    def codes(self) -> Tuple[int, ...]:
+        """
+        The glyph codes, hashable and cached until the word is modified
+        """
+        if self._codeTuple is None:
+            self._codeTuple = tuple(self._codes)
+        return self._codeTuple
+
+    @property
+    def glyphs(self) -> List[Glyph]:
+        return [_GLYPHS[c] for c in self._codes]
+
+    def __len__(self) -> int:
+        return len(self._codes)
+
+    def glyph(self, idx: int) -> Glyph:
+        return _GLYPHS[self._codes[idx]]
 
-    def getSoundStr(self) -> str:
-        out = []
-        for g in self.glyphs:
-            out.append(g.getSoundStr())
+    def isEmpty(self) -> bool:
+        return len(self._codes) == 1 and self._codes[0] == 0
+
+    # Mutation
+
+    def setGlyph(self, idx: int, glyph: Glyph):
+        if self._codes[idx] != glyph.code:
+            self._codes[idx] = glyph.code
+            self._invalidate()
+
+    def insertGlyph(self, idx: int, glyph: Glyph):
+        self._codes.insert(idx, glyph.code)
+        self._invalidate()
+
+    def popGlyph(self, idx: int) -> Glyph:
+        code = self._codes.pop(idx)
+        self._invalidate()
+        return _GLYPHS[code]
+
+    def toggleCons(self, idx: int, cons: Cons) -> Glyph:
+        """
+        Set the consonant of a glyph, or clear it if it's already set to cons
+        """
+        g = self.glyph(idx)
+        g = g.withCons(None if g.cons == cons else cons)
+        self.setGlyph(idx, g)
+        return g
+
+    def toggleVowel(self, idx: int, vowel: Vowel) -> Glyph:
+        """
+        Set the vowel of a glyph, or clear it if it's already set to vowel
+        """
+        g = self.glyph(idx)
+        g = g.withVowel(None if g.vowel == vowel else vowel)
+        self.setGlyph(idx, g)
+        return g
+
+    def toggleDot(self, idx: int) -> Glyph:
+        g = self.glyph(idx)
+        g = g.withDot(not g.dot)
+        self.setGlyph(idx, g)
+        return g
+
+    def clear(self):
+        """
+        Reset to a single empty glyph with no translation
+        """
+        self._codes = array(GLYPH_CODE_TYPE, [0])
+        self.value = ""
+        self._invalidate()
 
-        return CHAR_DELIM.join(out)
+    def getSoundStr(self) -> str:
+        if self._soundStr is None:
+            self._soundStr = CHAR_DELIM.join(
+                [_CODE_STRS[c] for c in self._codes])
+        return self._soundStr
+
+    def getKey(self) -> bytes:
+        """
+        Compact form of the sound string, for storing and looking up
+        translations
+        """
+        if self._key is None:
+            self._key = keyFromCodes(self._codes)
+        return self._key
 
     def copy(self) -> 'Word':
-        c = Word(*[g.copy() for g in self.glyphs])
-        c.value.set(self.value.copy())
-        return c
+        w = Word._wrap(array(GLYPH_CODE_TYPE, self._codes), self.value)
+        w._soundStr = self._soundStr
+        w._codeTuple = self._codeTuple
+        w._key = self._key
+        return w
 
 
-def _lookupCons(text: str) -> Cons:
-    if text.startswith("TH(hard)"):
-        return Cons.TH_HARD
-    elif text.startswith("TH(soft)"):
-        return Cons.TH_SOFT
-    else:
-        return Cons[text]
+class SoundStrError(ValueError):
+    """
+    Raised when parsing a malformed sound string
+    """
 
 
 def glyphFromStr(soundStr: str) -> Glyph:
-    dot = False
-    parts = soundStr.split(SOUND_DELIM)
-
-    if len(parts) == 1:
-        part = parts[0]
-        if part.startswith(tuple("AEIOU")):
-            vowel = Vowel[part]
-            cons = None
-        else:
-            vowel = None
-            cons = _lookupCons(part)
-    else:
-        part1, part2 = parts
-        if part1.startswith(tuple("AEIOU")):
-            dot = True
-            vowel = Vowel[part1]
-            cons = _lookupCons(part2)
-        else:
-            vowel = Vowel[part2]
-            cons = _lookupCons(part1)
+    try:
+        return _GLYPHS[_STR_CODES[soundStr]]
+    except KeyError:
+        raise SoundStrError(f"Invalid glyph: {soundStr!r}") from None
+
+
+def codesFromStr(soundStr: str) -> array:
+    """
+    Parse a word sound string into an array of glyph codes
+    """
+    try:
+        return array(GLYPH_CODE_TYPE,
+                     [_STR_CODES[x] for x in soundStr.split(CHAR_DELIM)])
+    except KeyError as err:
+        raise SoundStrError(
+            f"Invalid glyph {err.args[0]!r} in word {soundStr!r}") from None
 
-    return Glyph(cons, vowel, dot)
+
+def strFromCodes(codes: Iterable[int]) -> str:
+    """
+    Get the sound string of a sequence of valid glyph codes
+    """
+    return CHAR_DELIM.join([_CODE_STRS[c] for c in codes])
+
+
+def keyFromCodes(codes: Iterable[int]) -> bytes:
+    """
+    Pack glyph codes into a word key, little endian uint16s.
+    Glyphs that share a sound string share a code in the key
+    """
+    key = array(GLYPH_CODE_TYPE, [_KEY_CODES[c] for c in codes])
+    if sys.byteorder == "big":
+        key.byteswap()
+    return key.tobytes()
+
+
+def codesFromKey(key: bytes) -> array:
+    codes = array(GLYPH_CODE_TYPE)
+    codes.frombytes(key)
+    if sys.byteorder == "big":
+        codes.byteswap()
+    return codes
+
+
+def strFromKey(key: bytes) -> str:
+    return strFromCodes(codesFromKey(key))
 
 
 def wordFromStr(soundStr: str) -> Word:
-    return Word(*[glyphFromStr(x) for x in soundStr.split(CHAR_DELIM)])
+    return Word._wrap(codesFromStr(soundStr))
+
+
+def wordsFromStr(text: str) -> List[Word]:
+    """
+    Parse whitespace separated word sound strings
+    """
+    return [wordFromStr(x) for x in text.split()]
+
+
+_TOKEN_RE = re.compile(r"\S+")
+
+# (words, errors for the invalid tokens, characters of the text parsed so far)
+ParsedChunk = Tuple[List[Word], List[str], int]
+
+
+def parseWords(text: str, chunkWords: int = 1000) -> Iterator[ParsedChunk]:
+    """
+    Parse whitespace separated word sound strings chunkWords tokens at a time,
+    so a long text can be parsed a bit at a time.
+    Invalid tokens are skipped and reported
+    """
+    words: List[Word] = []
+    errors: List[str] = []
+    for match in _TOKEN_RE.finditer(text):
+        try:
+            words.append(wordFromStr(match.group()))
+        except SoundStrError as err:
+            errors.append(str(err))
+        if len(words) + len(errors) >= chunkWords:
+            yield words, errors, match.end()
+            words = []
+            errors = []
+    yield words, errors, len(text)
+
+
+def strFromWords(words: Iterable[Word], sep: str = " ") -> str:
+    return sep.join([w.getSoundStr() for w in words])
@@ -0,0 +1,148 @@
+"""
+Undo/redo as groups of encoded edits
+"""
+from collections import deque
+from typing import Deque, List
+
+from edits import Edit, EditOp, encodeEdit, decodeEdits
+
+# rough per group cost of the python objects around the encoded edits
+_GROUP_OVERHEAD = 120
+# groups are split once they reach this fraction of maxBytes
+_SPLIT_FRACTION = 4
+
+
+class _Group:
+    """
+    Edits made by one user action, and their inverses in the order they
+    have to be applied to undo it
+    """
+
+    __slots__ = ("forward", "inverse", "mergeWord")
+
+    def __init__(self, forward: bytes, inverse: bytes,
+                 mergeWord: int | None) -> None:
+        self.forward = forward
+        self.inverse = inverse
+        # word index, if this group is a single translation edit
+        # that the next one to the same word can merge into
+        self.mergeWord = mergeWord
+
+    @property
+    def size(self) -> int:
+        return len(self.forward) + len(self.inverse) + _GROUP_OVERHEAD
+
+
+class UndoHistory:
+    """
+    Edits are pushed with their inverse, and grouped by endGroup().
+    History is stored as encoded edit deltas, never copies of the document.
+    The oldest groups are dropped once there are more than maxDepth of them or
+    they take more than maxBytes. A group too big to fit (e.g. a huge paste) is
+    split, so only its oldest parts are dropped and undo can still step back
+    through the rest
+    """
+
+    def __init__(self, maxDepth: int = 1000, maxBytes: int = 1 << 20) -> None:
+        self.maxDepth = maxDepth
+        self.maxBytes = maxBytes
+
+        self._undo: Deque[_Group] = deque()
+        self._redo: List[_Group] = []
+        self._bytes = 0
+
+        self._forward: List[bytes] = []
+        self._inverse: List[bytes] = []
+        self._groupBytes = 0
+        self._mergeWord: int | None = None
+
+    def __len__(self) -> int:
+        return len(self._undo)
+
+    @property
+    def bytes(self) -> int:
+        return self._bytes
+
+    def canUndo(self) -> bool:
+        return len(self._undo) > 0
+
+    def canRedo(self) -> bool:
+        return len(self._redo) > 0
+
+    def clear(self):
+        self._undo.clear()
+        self._redo.clear()
+        self._bytes = 0
+        self._forward.clear()
+        self._inverse.clear()
+        self._groupBytes = 0
+        self._mergeWord = None
+
+    def push(self, edit: Edit, inverse: Edit):
+        if len(self._forward) == 0 and edit.op == EditOp.SET_VALUE:
+            self._mergeWord = edit.wordIdx
+        else:
+            self._mergeWord = None
+        forward = encodeEdit(edit)
+        backward = encodeEdit(inverse)
+        self._forward.append(forward)
+        self._inverse.append(backward)
+        self._groupBytes += len(forward) + len(backward)
+        if self._groupBytes >= self.maxBytes // _SPLIT_FRACTION:
+            self.endGroup()
+
+    def endGroup(self):
+        """
+        Close the group of edits pushed since the last call
+        """
+        if len(self._forward) == 0:
+            return
+
+        forward = b"".join(self._forward)
+        inverse = b"".join(reversed(self._inverse))
+        self._forward.clear()
+        self._inverse.clear()
+        self._groupBytes = 0
+
+        self._bytes -= sum(g.size for g in self._redo)
+        self._redo.clear()
+
+        top = self._undo[-1] if len(self._undo) > 0 else None
+        if (self._mergeWord is not None and top is not None
+                and top.mergeWord == self._mergeWord):
+            # keep typing in one translation as a single step
+            self._bytes -= top.size
+            top.forward = forward
+            self._bytes += top.size
+        else:
+            group = _Group(forward, inverse, self._mergeWord)
+            self._undo.append(group)
+            self._bytes += group.size
+
+        # the newest group is always kept
+        while len(self._undo) > 1 and (len(self._undo) > self.maxDepth
+                                       or self._bytes > self.maxBytes):
+            self._bytes -= self._undo.popleft().size
+
+    def undo(self) -> List[Edit] | None:
+        """
+        Get the edits that undo the last group, in order, None if there is none
+        """
+        self.endGroup()
+        if len(self._undo) == 0:
+            return None
+        group = self._undo.pop()
+        group.mergeWord = None
+        self._redo.append(group)
+        return list(decodeEdits(group.inverse))
+
+    def redo(self) -> List[Edit] | None:
+        """
+        Get the edits that redo the last undone group, in order, None if there is none
+        """
+        self.endGroup()
+        if len(self._redo) == 0:
+            return None
+        group = self._redo.pop()
+        self._undo.append(group)
+        return list(decodeEdits(group.forward))
@@ -0,0 +1,221 @@
+"""
+Crash-safe autosave: an append-only journal of edits on top of a snapshot.
+
+Every edit is appended as a small record, so autosaving costs O(edit).
+Once enough records have built up, compact() writes the whole document as
+a new snapshot and starts an empty journal.
+
+Journal layout, little endian:
+    header      magic, version, CRC32 of the snapshot file it applies to
+    records     uint32 body length, uint32 CRC32 of body, body
+    body        op, word index, glyph index, code count, uint16 codes,
+                UTF-8 value
+
+Recovery loads the snapshot and replays records up to the first torn or
+corrupt one. A journal whose snapshot CRC doesn't match was left behind by an
+interrupted compaction, the snapshot already holds its edits so it is dropped.
+"""
+import os
+import shutil
+import struct
+import time
+import zlib
+from typing import BinaryIO, Iterator, List, Sequence
+
+from glyphs import Word
+from edits import Edit, applyEdit, encodeEdit, decodeEdit, EDIT_FRAME
+from document import DocumentError, saveDocument, loadDocument, DOC_EXT
+
+DEFAULT_AUTOSAVE_DIR = os.path.join(os.path.dirname(__file__), "autosave")
+
+JOURNAL_MAGIC = b"TRNJ"
+JOURNAL_VERSION = 1
+
+_HEADER = struct.Struct("<4sHxxI")
+
+
+def _fileCRC(path: str) -> int:
+    crc = 0
+    with open(path, "rb") as f:
+        while chunk := f.read(1 << 20):
+            crc = zlib.crc32(chunk, crc)
+    return crc
+
+
+class Journal:
+    """
+    Autosave for a single document, stored as a snapshot and journal file
+    in directory.
+    Records are buffered and written out by flush(), which tick() calls at
+    most every syncDelay seconds
+    """
+
+    def __init__(self,
+                 directory: str = DEFAULT_AUTOSAVE_DIR,
+                 compactEvery: int = 2000,
+                 syncDelay: float = 1.0) -> None:
+        """
+        compactEvery: number of records after which compaction is due
+        """
+        self.snapshotPath = os.path.join(directory, "autosave" + DOC_EXT)
+        self.journalPath = os.path.join(directory, "autosave.journal")
+        self.compactEvery = compactEvery
+        self.syncDelay = syncDelay
+
+        self._file: BinaryIO | None = None
+        self._records = 0
+        self._dirtyTime: float | None = None
+        os.makedirs(directory, exist_ok=True)
+
+    def __len__(self) -> int:
+        """
+        Number of records since the last compaction
+        """
+        return self._records
+
+    def _readRecords(self, snapshotCRC: int) -> Iterator[Edit]:
+        """
+        Yield the journal's records, stops at the first bad one
+        and truncates it so appends continue after the last good record
+        """
+        try:
+            f = open(self.journalPath, "r+b")
+        except FileNotFoundError:
+            return
+
+        with f:
+            header = f.read(_HEADER.size)
+            if len(header) < _HEADER.size:
+                return
+            magic, version, crc = _HEADER.unpack(header)
+            if magic != JOURNAL_MAGIC or version != JOURNAL_VERSION or crc != snapshotCRC:
+                return
+
+            good = f.tell()
+            while True:
+                frame = f.read(EDIT_FRAME.size)
+                if len(frame) < EDIT_FRAME.size:
+                    break
+                length, crc = EDIT_FRAME.unpack(frame)
+                body = f.read(length)
+                if len(body) < length or zlib.crc32(body) != crc:
+                    break
+                try:
+                    edit = decodeEdit(body)
+                except (struct.error, ValueError):
+                    break
+                yield edit
+                good = f.tell()
+
+            f.truncate(good)
+
+    def recover(self) -> List[Word] | None:
+        """
+        Rebuild the document from the snapshot and journal,
+        None if there is no autosave.
+        Call before any append() or compact()
+        """
+        try:
+            with loadDocument(self.snapshotPath) as doc:
+                words = list(doc)
+            snapshotCRC = _fileCRC(self.snapshotPath)
+        except (FileNotFoundError, DocumentError):
+            return None
+
+        self._records = 0
+        consistent = True
+        for edit in self._readRecords(snapshotCRC):
+            try:
+                applyEdit(words, edit)
+            except (IndexError, ValueError):
+                # records past this point don't fit the document
+                consistent = False
+                break
+            self._records += 1
+
+        if consistent and self._records > 0:
+            self._file = open(self.journalPath, "ab")
+        else:
+            # no usable journal, start one against this snapshot
+            self.compact(words)
+        return words
+
+    def append(self, edit: Edit):
+        if self._file is None:
+            raise RuntimeError("Journal not started, call recover() or compact()")
+        self._file.write(encodeEdit(edit))
+        self._records += 1
+        if self._dirtyTime is None:
+            self._dirtyTime = time.monotonic()
+
+    def flush(self):
+        if self._file is None or self._dirtyTime is None:
+            return
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._dirtyTime = None
+
+    def compactDue(self) -> bool:
+        return self._records >= self.compactEvery
+
+    def tick(self, words: Sequence[Word] | None = None):
+        """
+        Call periodically, flushes and compacts when due.
+        Without words, compacting is left to the caller, see compactDue()
+        """
+        if words is not None and self.compactDue():
+            self.compact(words)
+        elif self._dirtyTime is not None and time.monotonic(
+        ) - self._dirtyTime >= self.syncDelay:
+            self.flush()
+
+    def compact(self, words: Sequence[Word]):
+        """
+        Replace the snapshot with words and start an empty journal
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+        overrides = {
+            wIdx: word.value
+            for wIdx, word in enumerate(words) if len(word.value) > 0
+        }
+        saveDocument(self.snapshotPath, words, overrides)
+        self._startJournal()
+
+    def compactFrom(self, docPath: str):
+        """
+        Use a saved document file as the new snapshot and start an empty journal.
+        Avoids decoding a document that was just opened
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+        tmpPath = self.snapshotPath + ".tmp"
+        shutil.copyfile(docPath, tmpPath)
+        os.replace(tmpPath, self.snapshotPath)
+        self._startJournal()
+
+    def _startJournal(self):
+        # If this is interrupted before the replace, the old journal's CRC
+        # won't match the new snapshot and it is ignored by recover()
+        tmpPath = self.journalPath + ".tmp"
+        with open(tmpPath, "wb") as f:
+            f.write(
+                _HEADER.pack(JOURNAL_MAGIC, JOURNAL_VERSION,
+                             _fileCRC(self.snapshotPath)))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmpPath, self.journalPath)
+
+        self._file = open(self.journalPath, "ab")
+        self._records = 0
+        self._dirtyTime = None
+
+    def close(self):
+        if self._file is not None:
+            self.flush()
+            self._file.close()
+            self._file = None
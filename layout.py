@@ -0,0 +1,133 @@
+from bisect import bisect_left, bisect_right
+from typing import List, Tuple
+
+from glyphs import GLYPH_TOTAL_X, GLYPH_TOTAL_Y, GLYPH_X
+from word_buffer import WordBuffer
+
+LINE_GAP = 20
+
+
+class Line:
+    """
+    A single wrapped line of words, starting at word index start.
+    xs holds the x offset of each word, relative to the layout origin.
+    text caches the line's translated text, see State.getText()
+    """
+
+    __slots__ = ("y", "start", "xs", "text")
+
+    def __init__(self, y: float, start: int) -> None:
+        self.y = y
+        self.start = start
+        self.xs: List[float] = []
+        self.text: str | None = None
+
+    @property
+    def words(self) -> List[Tuple[int, float]]:
+        """
+        (word index, x offset) pairs
+        """
+        return list(zip(range(self.start, self.start + len(self.xs)),
+                        self.xs))
+
+
+class WordLayout:
+    """
+    Caches line breaks and word positions for a word sequence.
+    Only recomputed when the document version or available width changes.
+    Edits only relayout from the line before the first changed word, until
+    the line breaks line up with the old layout again
+    """
+
+    def __init__(self,
+                 glyphWidth: float = GLYPH_TOTAL_X,
+                 wordGap: float = GLYPH_X,
+                 lineHeight: float = GLYPH_TOTAL_Y + LINE_GAP) -> None:
+        self.glyphWidth = glyphWidth
+        self.wordGap = wordGap
+        self.lineHeight = lineHeight
+
+        self.lines: List[Line] = []
+        # y and first word of each line, kept separately for bisecting
+        self._lineYs: List[float] = []
+        self._lineStarts: List[int] = []
+        self._version = -1
+        self._width = -1.0
+
+    @property
+    def height(self) -> float:
+        if len(self.lines) == 0:
+            return 0
+        return self.lines[-1].y + self.lineHeight
+
+    def update(self, words: WordBuffer, width: float, version: int) -> bool:
+        """
+        Recompute the layout if needed, returns True if it changed.
+        Consumes the changed range of words
+        """
+        if version == self._version and width == self._width:
+            return False
+
+        changes = words.takeChanges()
+        if width != self._width or len(self.lines) == 0:
+            self.lines = []
+            self._lineStarts = []
+            self._relayout(words, width, 0, 0, 0)
+        elif changes is not None:
+            start, end, delta = changes
+            # the previous line may now fit the first changed word
+            lineIdx = max(0, bisect_right(self._lineStarts, start) - 2)
+            self._relayout(words, width, lineIdx, end, delta)
+
+        self._version = version
+        self._width = width
+        return True
+
+    def _relayout(self, words: WordBuffer, width: float, lineIdx: int,
+                  end: int, delta: int):
+        """
+        Wrap words starting from lines[lineIdx], reusing the old lines once
+        a line starts at or after end on the same word as before the change
+        """
+        oldLines = self.lines
+        oldStarts = self._lineStarts
+        if lineIdx < len(oldLines):
+            line = Line(oldLines[lineIdx].y, oldLines[lineIdx].start)
+        else:
+            line = Line(0, 0)
+        lines = oldLines[:lineIdx]
+        lines.append(line)
+
+        x = 0.0
+        tail: List[Line] = []
+        for wIdx in range(line.start, len(words)):
+            wordWidth = words.wordLength(wIdx) * self.glyphWidth
+            if x + wordWidth > width and len(line.xs) > 0:
+                y = line.y + self.lineHeight
+                if wIdx >= end:
+                    old = bisect_left(oldStarts, wIdx - delta)
+                    if old < len(oldLines) and oldStarts[old] == wIdx - delta:
+                        tail = oldLines[old:]
+                        dy = y - tail[0].y
+                        for t in tail:
+                            t.y += dy
+                            t.start += delta
+                        break
+                line = Line(y, wIdx)
+                lines.append(line)
+                x = 0
+            line.xs.append(x)
+            x += wordWidth + self.wordGap
+
+        lines.extend(tail)
+        self.lines = lines
+        self._lineYs = [line.y for line in lines]
+        self._lineStarts = [line.start for line in lines]
+
+    def visibleLines(self, top: float, bottom: float) -> List[Line]:
+        """
+        Get the lines that intersect the range [top, bottom], in layout coordinates
+        """
+        start = bisect_left(self._lineYs, top - self.lineHeight)
+        end = bisect_right(self._lineYs, bottom)
+        return self.lines[start:end]
@@ -0,0 +1,206 @@
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from glyphs import Word, GlyphParts, GLYPH_MASKS
+
+NUM_PARTS = len(GlyphParts)
+ALL_PARTS = (1 << NUM_PARTS) - 1
+
+
+class GlyphPattern:
+    """
+    Constraint on a single glyph, as GlyphParts masks.
+    Every part in required must be present, no part in forbidden may be
+    """
+
+    __slots__ = ("required", "forbidden")
+
+    def __init__(self, required: int = 0, forbidden: int = 0) -> None:
+        self.required = required
+        self.forbidden = forbidden
+
+    @staticmethod
+    def exact(mask: int) -> 'GlyphPattern':
+        return GlyphPattern(mask, ALL_PARTS & ~mask)
+
+    @staticmethod
+    def contains(mask: int) -> 'GlyphPattern':
+        return GlyphPattern(mask, 0)
+
+    def isWildcard(self) -> bool:
+        return self.required == 0 and self.forbidden == 0
+
+    def matches(self, mask: int) -> bool:
+        return (mask & self.required) == self.required and (
+            mask & self.forbidden) == 0
+
+
+WILDCARD = GlyphPattern()
+
+
+def patternFromWord(word: Word, exact: bool) -> List[GlyphPattern]:
+    """
+    Build a pattern from a partially entered word.
+    Empty glyphs are wildcards, other glyphs either match exactly
+    or match any glyph containing their parts
+    """
+    out = []
+    for code in word.codes:
+        mask = GLYPH_MASKS[code]
+        if mask == 0:
+            out.append(WILDCARD)
+        elif exact:
+            out.append(GlyphPattern.exact(mask))
+        else:
+            out.append(GlyphPattern.contains(mask))
+    return out
+
+
+# set bit positions of every possible part mask,
+# built from the mask with its highest bit cleared
+_MASK_BITS: List[List[int]] = [[]]
+for _mask in range(1, ALL_PARTS + 1):
+    _high = _mask.bit_length() - 1
+    _MASK_BITS.append(_MASK_BITS[_mask & ~(1 << _high)] + [_high])
+
+
+class _LengthGroup:
+    """
+    All indexed words with the same number of glyphs.
+    parts[pos][part] is a bitset of the word ids with that part at that position
+    """
+
+    __slots__ = ("keys", "parts", "live")
+
+    def __init__(self, length: int) -> None:
+        self.keys: List[bytes] = []
+        self.parts: List[List[int]] = [[0] * NUM_PARTS for _ in range(length)]
+        # bitset of ids that have not been removed
+        self.live = 0
+
+
+class PatternIndex:
+    """
+    Bitmask index over the glyph part masks of a set of words.
+    A query ANDs together one bitset per constrained part, so its cost
+    depends on the pattern, not on scanning every word
+    """
+
+    def __init__(self, words: Iterable[Tuple[bytes, Sequence[int]]] = ()) -> None:
+        """
+        words: (word key, glyph codes) pairs
+        """
+        self._groups: Dict[int, _LengthGroup] = {}
+        # word key -> (length, id)
+        self._ids: Dict[bytes, Tuple[int, int]] = {}
+        self._build(words)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def _group(self, length: int) -> _LengthGroup:
+        try:
+            return self._groups[length]
+        except KeyError:
+            group = _LengthGroup(length)
+            self._groups[length] = group
+            return group
+
+    def _build(self, words: Iterable[Tuple[bytes, Sequence[int]]]):
+        # Setting bits one at a time on python ints is O(n) each,
+        # so collect into bytearrays and convert once
+        buffers: Dict[int, List[List[bytearray]]] = {}
+        for key, codes in words:
+            if key in self._ids:
+                continue
+            length = len(codes)
+            group = self._group(length)
+            wordId = len(group.keys)
+            group.keys.append(key)
+            self._ids[key] = (length, wordId)
+
+            try:
+                bufs = buffers[length]
+            except KeyError:
+                bufs = [[bytearray() for _ in range(NUM_PARTS)]
+                        for _ in range(length)]
+                buffers[length] = bufs
+
+            byte = wordId >> 3
+            bit = 1 << (wordId & 7)
+            for pos, code in enumerate(codes):
+                for part in _MASK_BITS[GLYPH_MASKS[code]]:
+                    buf = bufs[pos][part]
+                    if len(buf) <= byte:
+                        buf.extend(bytes(byte + 1 - len(buf)))
+                    buf[byte] |= bit
+
+        for length, bufs in buffers.items():
+            group = self._groups[length]
+            for pos in range(length):
+                for part in range(NUM_PARTS):
+                    group.parts[pos][part] |= int.from_bytes(
+                        bufs[pos][part], "little")
+            group.live = (1 << len(group.keys)) - 1
+
+    def add(self, key: bytes, codes: Sequence[int]):
+        if key in self._ids:
+            return
+
+        length = len(codes)
+        group = self._group(length)
+        wordId = len(group.keys)
+        group.keys.append(key)
+        self._ids[key] = (length, wordId)
+
+        bit = 1 << wordId
+        for pos, code in enumerate(codes):
+            parts = group.parts[pos]
+            for part in _MASK_BITS[GLYPH_MASKS[code]]:
+                parts[part] |= bit
+        group.live |= bit
+
+    def remove(self, key: bytes):
+        try:
+            length, wordId = self._ids.pop(key)
+        except KeyError:
+            return
+        # ids are not reused, just masked out of results
+        self._groups[length].live &= ~(1 << wordId)
+
+    def query(self,
+              pattern: Sequence[GlyphPattern],
+              limit: int = 100,
+              prefix: bool = False) -> List[bytes]:
+        """
+        Get the keys of up to limit words matching pattern.
+        If prefix is set, longer words whose first glyphs match are included
+        """
+        out: List[bytes] = []
+        if prefix:
+            lengths = sorted(l for l in self._groups if l >= len(pattern))
+        elif len(pattern) in self._groups:
+            lengths = [len(pattern)]
+        else:
+            lengths = []
+
+        for length in lengths:
+            group = self._groups[length]
+            candidates = group.live
+            for pos, pat in enumerate(pattern):
+                if candidates == 0:
+                    break
+                parts = group.parts[pos]
+                for part in _MASK_BITS[pat.required]:
+                    candidates &= parts[part]
+                for part in _MASK_BITS[pat.forbidden]:
+                    candidates &= ~parts[part]
+
+            while candidates != 0 and len(out) < limit:
+                low = candidates & -candidates
+                out.append(group.keys[low.bit_length() - 1])
+                candidates ^= low
+
+            if len(out) >= limit:
+                break
+
+        return out
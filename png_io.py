@@ -0,0 +1,203 @@
+"""
+Minimal PNG reading and writing with zlib and numpy, so image export and
+recognition work without Pillow
+"""
+import struct
+import zlib
+
+import numpy as np
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# color type -> channels
+_CHANNELS = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+
+
+class PNGError(ValueError):
+    pass
+
+
+def writePNG(path: str, pixels: np.ndarray):
+    """
+    Write a uint8 array as a PNG, HxW is grayscale and HxWx4 is RGBA
+    """
+    if pixels.ndim == 2:
+        height, width = pixels.shape
+        colorType = 0
+    else:
+        height, width, _ = pixels.shape
+        colorType = 6
+
+    # every row starts with filter type 0
+    rows = pixels.reshape(height, -1)
+    raw = np.zeros((height, rows.shape[1] + 1), dtype=np.uint8)
+    raw[:, 1:] = rows
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(
+            ">I", zlib.crc32(kind + data))
+
+    with open(path, "wb") as f:
+        f.write(PNG_SIGNATURE)
+        f.write(
+            chunk(b"IHDR",
+                  struct.pack(">IIBBBBB", width, height, 8, colorType, 0, 0,
+                              0)))
+        f.write(chunk(b"IDAT", zlib.compress(raw.tobytes(), 6)))
+        f.write(chunk(b"IEND", b""))
+
+
+def _paeth(left: np.ndarray, up: np.ndarray,
+           upLeft: np.ndarray) -> np.ndarray:
+    pa = np.abs(up - upLeft)
+    pb = np.abs(left - upLeft)
+    pc = np.abs(left + up - 2 * upLeft)
+    return np.where((pa <= pb) & (pa <= pc), left,
+                    np.where(pb <= pc, up, upLeft))
+
+
+def _predict(kind: int, left: np.ndarray, up: np.ndarray,
+             upLeft: np.ndarray) -> np.ndarray:
+    if kind == 1:
+        return left
+    if kind == 2:
+        return up
+    if kind == 3:
+        return (left + up) >> 1
+    return _paeth(left, up, upLeft)
+
+
+def _unfilterDiagonal(raw: np.ndarray, height: int, stride: int,
+                      bpp: int) -> np.ndarray:
+    """
+    Undo any mix of filters, one anti-diagonal of pixels at a time.
+    A pixel only depends on the pixels left, up and up-left of it, which are
+    all on earlier diagonals, so each diagonal is done in one numpy step
+    """
+    width = stride // bpp
+    kinds = raw[:, 0, None]
+    used = [int(k) for k in np.unique(kinds) if k != 0]
+    # common case, every row uses the same filter
+    single = used[0] if len(used) == 1 and np.all(kinds == used[0]) else None
+    lines = raw[:, 1:].reshape(height, width, bpp)
+    # rows are sheared so diagonals are columns, pixel (y, x) is at
+    # [y + 1, x + y + 1], with zeros above and left of the image
+    cols = width + height + 1
+    sheared = np.zeros((height, cols, bpp), dtype=np.int16)
+    for y in range(height):
+        sheared[y, y + 1:y + 1 + width] = lines[y]
+    out = np.zeros((height + 1, cols, bpp), dtype=np.int16)
+
+    for col in range(1, width + height):
+        y0 = max(0, col - width)
+        y1 = min(height, col)
+        left = out[y0 + 1:y1 + 1, col - 1]
+        up = out[y0:y1, col - 1]
+        upLeft = out[y0:y1, col - 2]
+        if single is not None:
+            pred = _predict(single, left, up, upLeft)
+        else:
+            kind = kinds[y0:y1]
+            pred = np.select([kind == k for k in used],
+                             [_predict(k, left, up, upLeft) for k in used], 0)
+        out[y0 + 1:y1 + 1, col] = (sheared[y0:y1, col] + pred) & 0xFF
+
+    pixels = np.empty((height, width, bpp), dtype=np.uint8)
+    for y in range(height):
+        pixels[y] = out[y + 1, y + 1:y + 1 + width]
+    return pixels.reshape(height, stride)
+
+
+def _unfilter(raw: np.ndarray, height: int, stride: int,
+              bpp: int) -> np.ndarray:
+    """
+    Undo the per row PNG filters, raw has the filter type byte on each row
+    """
+    kinds = raw[:, 0]
+    unknown = kinds[kinds > 4]
+    if len(unknown) > 0:
+        raise PNGError(f"Unknown PNG filter type: {unknown[0]}")
+    # average and paeth depend on the reconstructed byte to the left
+    if np.any(kinds >= 3):
+        return _unfilterDiagonal(raw, height, stride, bpp)
+
+    out = np.zeros((height, stride), dtype=np.uint8)
+    prev = np.zeros(stride, dtype=np.uint8)
+    for y in range(height):
+        kind = kinds[y]
+        line = raw[y, 1:]
+        if kind == 0:
+            cur = line.copy()
+        elif kind == 1:
+            # each byte adds the reconstructed byte bpp to the left,
+            # so every channel is a running sum
+            cur = line.reshape(-1, bpp).cumsum(axis=0, dtype=np.uint8).ravel()
+        else:
+            cur = line + prev
+        out[y] = cur
+        prev = cur
+    return out
+
+
+def readPNG(path: str) -> np.ndarray:
+    """
+    Read an 8 bit, non interlaced PNG as HxW, HxWx2, HxWx3 or HxWx4 uint8.
+    Palette images are expanded to RGB(A)
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    if not data.startswith(PNG_SIGNATURE):
+        raise PNGError(f"Not a PNG file: {path}")
+
+    pos = len(PNG_SIGNATURE)
+    header = None
+    palette = None
+    alpha = None
+    idat = []
+    while pos + 8 <= len(data):
+        length, kind = struct.unpack_from(">I4s", data, pos)
+        body = data[pos + 8:pos + 8 + length]
+        pos += 12 + length
+        if kind == b"IHDR":
+            header = struct.unpack(">IIBBBBB", body)
+        elif kind == b"PLTE":
+            palette = np.frombuffer(body, dtype=np.uint8).reshape(-1, 3)
+        elif kind == b"tRNS":
+            alpha = np.frombuffer(body, dtype=np.uint8)
+        elif kind == b"IDAT":
+            idat.append(body)
+        elif kind == b"IEND":
+            break
+
+    if header is None:
+        raise PNGError(f"Missing PNG header: {path}")
+    width, height, depth, colorType, _, _, interlace = header
+    if depth != 8 or interlace != 0 or colorType not in _CHANNELS:
+        raise PNGError(
+            f"Unsupported PNG (depth {depth}, color type {colorType}, "
+            f"interlace {interlace}): {path}")
+
+    channels = _CHANNELS[colorType]
+    stride = width * channels
+    try:
+        raw = np.frombuffer(zlib.decompress(b"".join(idat)), dtype=np.uint8)
+    except zlib.error as err:
+        raise PNGError(f"Corrupt PNG data: {path}: {err}") from None
+    if len(raw) < height * (stride + 1):
+        raise PNGError(f"Truncated PNG data: {path}")
+    rows = _unfilter(raw[:height * (stride + 1)].reshape(height, stride + 1),
+                     height, stride, channels)
+
+    if colorType == 3:
+        if palette is None:
+            raise PNGError(f"Missing PNG palette: {path}")
+        idx = rows.reshape(height, width)
+        if alpha is not None:
+            lut = np.full((len(palette), 4), 255, dtype=np.uint8)
+            lut[:, :3] = palette
+            lut[:len(alpha), 3] = alpha[:len(palette)]
+            return lut[idx]
+        return palette[idx]
+    if channels == 1:
+        return rows.reshape(height, width)
+    return rows.reshape(height, width, channels)
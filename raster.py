@@ -0,0 +1,179 @@
+"""
+Anti-aliased NumPy rasterizer for glyph line art.
+Used to build the glyph texture atlas and for image export
+"""
+import math
+from typing import Dict, Sequence, Tuple
+
+import numpy as np
+
+from glyphs import GLYPH_THICK, GLYPH_DOT_RAD, GLYPH_TOTAL_X
+from glyph_geometry import GLYPH_GEOMETRY, GLYPH_DOT_POS
+
+# extra space around a glyph's nominal box covered by line ends and the dot,
+# at scale 1.0
+GLYPH_PAD = math.ceil(GLYPH_THICK / 2) + 1
+GLYPH_DOT_BOTTOM = GLYPH_DOT_POS[1] + GLYPH_DOT_RAD
+
+
+class Canvas:
+    """
+    Single channel float32 coverage image, 0 is empty and 1 is fully covered.
+    Shapes are combined with max, so overlapping lines don't darken
+    """
+
+    def __init__(self, width: int, height: int) -> None:
+        self.width = width
+        self.height = height
+        self.pixels = np.zeros((height, width), dtype=np.float32)
+
+    def _region(self, x0: float, y0: float, x1: float, y1: float):
+        """
+        Clamped pixel bounds and pixel center grids for a box
+        """
+        ix0 = max(0, int(math.floor(x0)))
+        iy0 = max(0, int(math.floor(y0)))
+        ix1 = min(self.width, int(math.ceil(x1)) + 1)
+        iy1 = min(self.height, int(math.ceil(y1)) + 1)
+        if ix0 >= ix1 or iy0 >= iy1:
+            return None
+        xs = np.arange(ix0, ix1, dtype=np.float32) + 0.5
+        ys = np.arange(iy0, iy1, dtype=np.float32)[:, None] + 0.5
+        return ix0, iy0, ix1, iy1, xs, ys
+
+    def _blend(self, ix0: int, iy0: int, ix1: int, iy1: int, dist,
+               halfWidth: float):
+        # 1 pixel wide linear falloff at the edge
+        cover = np.clip(halfWidth + 0.5 - dist, 0, 1)
+        region = self.pixels[iy0:iy1, ix0:ix1]
+        np.maximum(region, cover, out=region)
+
+    def line(self, x1: float, y1: float, x2: float, y2: float,
+             thick: float):
+        """
+        Draw a line with round caps
+        """
+        half = thick / 2
+        bounds = self._region(
+            min(x1, x2) - half - 1,
+            min(y1, y2) - half - 1,
+            max(x1, x2) + half + 1,
+            max(y1, y2) + half + 1)
+        if bounds is None:
+            return
+        ix0, iy0, ix1, iy1, xs, ys = bounds
+
+        dx = x2 - x1
+        dy = y2 - y1
+        lenSq = dx * dx + dy * dy
+        px = xs - x1
+        py = ys - y1
+        if lenSq == 0:
+            t = 0
+        else:
+            t = np.clip((px * dx + py * dy) / lenSq, 0, 1)
+        dist = np.hypot(px - t * dx, py - t * dy)
+        self._blend(ix0, iy0, ix1, iy1, dist, half)
+
+    def ring(self, cx: float, cy: float, radius: float, thick: float):
+        half = thick / 2
+        r = radius + half + 1
+        bounds = self._region(cx - r, cy - r, cx + r, cy + r)
+        if bounds is None:
+            return
+        ix0, iy0, ix1, iy1, xs, ys = bounds
+        dist = np.abs(np.hypot(xs - cx, ys - cy) - radius)
+        self._blend(ix0, iy0, ix1, iy1, dist, half)
+
+    def segments(self, segs: Sequence[float], x: float, y: float,
+                 scale: float, thick: float):
+        """
+        Draw flattened x1, y1, x2, y2 segments, scaled and offset by x, y
+        """
+        for i in range(0, len(segs), 4):
+            self.line(x + segs[i] * scale, y + segs[i + 1] * scale,
+                      x + segs[i + 2] * scale, y + segs[i + 3] * scale, thick)
+
+    def glyph(self, code: int, wordline: bool, x: float, y: float,
+              scale: float = 1.0):
+        """
+        Draw a glyph with its top left corner at x, y
+        """
+        geom = GLYPH_GEOMETRY[code][1 if wordline else 0]
+        thick = GLYPH_THICK * scale
+        self.segments(geom.segments, x, y, scale, thick)
+        if geom.dot:
+            self.ring(x + GLYPH_DOT_POS[0] * scale,
+                      y + GLYPH_DOT_POS[1] * scale, GLYPH_DOT_RAD * scale,
+                      thick)
+
+    def paste(self, image: np.ndarray, x: int, y: int):
+        """
+        Combine a coverage image into this one, with its top left at x, y
+        """
+        h, w = image.shape
+        region = self.pixels[y:y + h, x:x + w]
+        np.maximum(region, image[:region.shape[0], :region.shape[1]],
+                   out=region)
+
+    def toRGBA(self, color=(255, 255, 255)) -> np.ndarray:
+        """
+        Get the image in a single color, with coverage as alpha
+        """
+        out = np.empty((self.height, self.width, 4), dtype=np.uint8)
+        out[..., :3] = color
+        out[..., 3] = np.rint(self.pixels * 255)
+        return out
+
+    def toGray(self, background: int = 255, foreground: int = 0) -> np.ndarray:
+        """
+        Get the image as 8 bit grayscale, blended over background
+        """
+        return np.rint(background + (foreground - background) *
+                       self.pixels).astype(np.uint8)
+
+
+class GlyphStamps:
+    """
+    Glyph coverage images at one scale, on whole pixel positions.
+    Each distinct segment is only rasterized once, glyphs are built by
+    combining the images of their segments
+    """
+
+    def __init__(self, scale: float) -> None:
+        self.scale = scale
+        # the glyph's origin is offset by pad in the image
+        self.pad = math.ceil(GLYPH_PAD * scale)
+        self.width = math.ceil(GLYPH_TOTAL_X * scale) + 2 * self.pad
+        self.height = math.ceil(GLYPH_DOT_BOTTOM * scale) + 2 * self.pad
+        self._segments: Dict[Tuple[float, ...], np.ndarray] = {}
+        self._dot: np.ndarray | None = None
+
+    def _segment(self, seg: Tuple[float, ...]) -> np.ndarray:
+        image = self._segments.get(seg)
+        if image is None:
+            canvas = Canvas(self.width, self.height)
+            canvas.segments(seg, self.pad, self.pad, self.scale,
+                            GLYPH_THICK * self.scale)
+            image = canvas.pixels
+            self._segments[seg] = image
+        return image
+
+    def _dotImage(self) -> np.ndarray:
+        if self._dot is None:
+            canvas = Canvas(self.width, self.height)
+            canvas.ring(self.pad + GLYPH_DOT_POS[0] * self.scale,
+                        self.pad + GLYPH_DOT_POS[1] * self.scale,
+                        GLYPH_DOT_RAD * self.scale, GLYPH_THICK * self.scale)
+            self._dot = canvas.pixels
+        return self._dot
+
+    def glyph(self, code: int, wordline: bool) -> np.ndarray:
+        geom = GLYPH_GEOMETRY[code][1 if wordline else 0]
+        segs = geom.segments
+        images = [self._segment(segs[i:i + 4]) for i in range(0, len(segs), 4)]
+        if geom.dot:
+            images.append(self._dotImage())
+        if len(images) == 0:
+            return np.zeros((self.height, self.width), dtype=np.float32)
+        return np.maximum.reduce(images)
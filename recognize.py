@@ -0,0 +1,434 @@
+"""
+Recognize Trunic text in images (screenshots or exported pages).
+
+Word lines are found as long horizontal strokes, each word is split into
+glyphs of the standard width, and every glyph part is tested by sampling
+the image along the same geometry the glyphs are drawn with.
+Each glyph gets a confidence in [0, 1], the agreement of its least certain part.
+
+    python recognize.py shots/*.png [-f jsonl] [--tdoc out/] [-j workers]
+"""
+import argparse
+import json
+import math
+import os
+import sqlite3
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, List, TextIO, Tuple
+
+import numpy as np
+
+from glyphs import (Word, GlyphParts, GLYPH_MASKS, NUM_CODES, GLYPH_TOTAL_X,
+                    GLYPH_DOT_RAD,
+                    WORD_LINE_Y, isValidCode, partMask)
+from glyph_geometry import GlyphGeometry, GLYPH_DOT_POS
+from png_io import readPNG
+from document import DOC_EXT, saveDocument
+from word_db import WordDB, WordDBError, DEFAULT_DB_PATH, upgradeDB
+from batch_translate import orderedMap
+
+# a word and the confidence of each of its glyphs
+RecognizedWord = Tuple[Word, Tuple[float, ...]]
+
+# glyphs below this are reported as uncertain
+DEFAULT_MIN_CONFIDENCE = 0.6
+
+# samples taken along each part
+_SAMPLES = 6
+
+
+def _buildSamples() -> np.ndarray:
+    """
+    Sample points for each part, relative to the glyph's top left at scale 1.0,
+    in word line mode. Points stay away from segment ends, where parts meet
+    """
+    out = np.zeros((len(GlyphParts), _SAMPLES, 2), dtype=np.float32)
+    for part in GlyphParts:
+        row = out[part.value - 1]
+        if part == GlyphParts.DOT:
+            # lower half of the ring, the top touches the glyph's bottom lines
+            angles = np.linspace(0, math.pi, _SAMPLES)
+            row[:, 0] = GLYPH_DOT_POS[0] + GLYPH_DOT_RAD * np.cos(angles)
+            row[:, 1] = GLYPH_DOT_POS[1] + GLYPH_DOT_RAD * np.sin(angles)
+            continue
+
+        # skip the word line that every word line geometry starts with
+        segs = GlyphGeometry((part, ), True).segments[4:]
+        numSegs = len(segs) // 4
+        perSeg = _SAMPLES // numSegs
+        ts = np.linspace(0.25, 0.75, perSeg)
+        for i in range(numSegs):
+            x1, y1, x2, y2 = segs[i * 4:i * 4 + 4]
+            row[i * perSeg:(i + 1) * perSeg, 0] = x1 + (x2 - x1) * ts
+            row[i * perSeg:(i + 1) * perSeg, 1] = y1 + (y2 - y1) * ts
+    return out
+
+
+_SAMPLE_POINTS = _buildSamples()
+
+_VALID = np.array([c for c in range(NUM_CODES) if isValidCode(c)],
+                  dtype=np.int32)
+# part present bits of each valid code
+_VALID_PARTS = np.array([[(GLYPH_MASKS[c] & partMask(p)) != 0
+                          for p in GlyphParts] for c in _VALID],
+                        dtype=np.float32)
+
+
+def loadImage(path: str) -> np.ndarray:
+    """
+    Load an image as float32 grayscale in [0, 1].
+    Uses Pillow if installed, otherwise only PNG is supported
+    """
+    try:
+        from PIL import Image
+    except ImportError:
+        pixels = readPNG(path)
+    else:
+        with Image.open(path) as img:
+            pixels = np.asarray(img.convert("RGBA" if "A" in
+                                            img.getbands() else "RGB"))
+
+    pixels = pixels.astype(np.float32) / 255
+    if pixels.ndim == 2:
+        return pixels
+    channels = pixels.shape[2]
+    if channels in (2, 4):
+        # over black, exported glyph images are light ink on transparent
+        alpha = pixels[..., -1:]
+        pixels = pixels[..., :-1] * alpha
+    if channels <= 2:
+        return pixels[..., 0]
+    return pixels @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+
+def inkCoverage(gray: np.ndarray) -> np.ndarray:
+    """
+    Map grayscale to ink coverage in [0, 1], either polarity.
+    The background is taken to be the most common level
+    """
+    # levels from a subsample, full image statistics are slow on large pages
+    sample = gray[::3, ::3]
+    background = float(np.median(sample))
+    top = float(np.percentile(np.abs(sample - background), 99.9))
+    ink = np.abs(gray - background)
+    if top <= 0:
+        return np.zeros_like(gray)
+    return np.clip(ink / top, 0, 1)
+
+
+def _runs(mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Runs of True along each row, as row, start and length arrays
+    """
+    height, width = mask.shape
+    padded = np.zeros((height, width + 2), dtype=np.int8)
+    padded[:, 1:-1] = mask
+    edges = np.diff(padded, axis=1)
+    startRows, starts = np.nonzero(edges == 1)
+    _, ends = np.nonzero(edges == -1)
+    # nonzero is row major, so starts and ends pair up
+    return startRows, starts, ends - starts
+
+
+def _strokeWidth(mask: np.ndarray) -> float:
+    """
+    Typical line thickness, most strokes are crossed vertically
+    by a run about as long as they are thick
+    """
+    _, _, lengths = _runs(mask[:, ::3].T)
+    if len(lengths) == 0:
+        return 1.0
+    return float(np.median(lengths))
+
+
+class _WordLine:
+    """
+    A row of words sharing a word line at y
+    """
+
+    __slots__ = ("y", "words")
+
+    def __init__(self, y: float, words: List[Tuple[int, int]]) -> None:
+        self.y = y
+        # (x start, x end) of each word's line
+        self.words = words
+
+
+def findWordLines(mask: np.ndarray, thick: float) -> List[_WordLine]:
+    """
+    Find word lines, as runs much longer than where diagonals meet can make.
+    A glyph is 20 strokes wide
+    """
+    rows, starts, lengths = _runs(mask)
+    keep = lengths >= max(8, 10 * thick)
+    rows = rows[keep]
+    starts = starts[keep]
+    ends = starts + lengths[keep]
+    if len(rows) == 0:
+        return []
+
+    # bands of adjacent rows are one line
+    uniqueRows = np.unique(rows)
+    breaks = np.nonzero(np.diff(uniqueRows) > 1)[0] + 1
+    out = []
+    gap = max(1, int(thick))
+    for band in np.split(uniqueRows, breaks):
+        inBand = (rows >= band[0]) & (rows <= band[-1])
+        order = np.argsort(starts[inBand])
+        bandStarts = starts[inBand][order]
+        bandEnds = ends[inBand][order]
+
+        words: List[Tuple[int, int]] = []
+        for s, e in zip(bandStarts.tolist(), bandEnds.tolist()):
+            if len(words) > 0 and s <= words[-1][1] + gap:
+                words[-1] = (words[-1][0], max(words[-1][1], e))
+            else:
+                words.append((s, e))
+        out.append(_WordLine((band[0] + band[-1] + 1) / 2, words))
+    return out
+
+
+def estimateScale(mask: np.ndarray, lines: List[_WordLine],
+                  thick: float) -> float | None:
+    """
+    Estimate the glyph scale from how far ink reaches above each word line,
+    the top of the glyphs is WORD_LINE_Y above it
+    """
+    estimates = []
+    for line in lines:
+        x0 = line.words[0][0]
+        x1 = line.words[-1][1]
+        rowInk = mask[:int(line.y), x0:x1].any(axis=1)
+        top = int(line.y)
+        # walk up until two empty rows
+        while top > 0 and (rowInk[top - 1] or (top > 1 and rowInk[top - 2])):
+            top -= 1
+        extent = line.y - top - thick / 2
+        if extent > 2 * thick:
+            estimates.append(extent / WORD_LINE_Y)
+    if len(estimates) == 0:
+        return None
+    return float(np.median(estimates))
+
+
+def refineScale(lines: List[_WordLine], scale: float, thick: float) -> float:
+    """
+    Fit the scale to the word widths, which are a whole number of glyphs
+    plus the line caps. Much more precise than the height estimate
+    """
+    widths = np.array([x1 - x0 for line in lines for x0, x1 in line.words],
+                      dtype=np.float64)
+    glyphs = np.maximum(1, np.round(widths / (GLYPH_TOTAL_X * scale)))
+    if len(np.unique(glyphs)) > 1:
+        # widths = glyphs * GLYPH_TOTAL_X * scale + caps
+        slope, _ = np.polyfit(glyphs, widths, 1)
+        return float(slope / GLYPH_TOTAL_X)
+    return float(np.mean(widths - thick) / (glyphs[0] * GLYPH_TOTAL_X))
+
+
+def decodeCoverage(coverage: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Pick the valid glyph code that best agrees with each row of
+    per part coverage, returns the codes and their confidences
+    """
+    agree = coverage @ _VALID_PARTS.T + (1 - coverage) @ (1 - _VALID_PARTS).T
+    best = np.argmax(agree, axis=1)
+    parts = _VALID_PARTS[best]
+    partAgree = np.where(parts > 0, coverage, 1 - coverage)
+    return _VALID[best], partAgree.min(axis=1)
+
+
+def recognizeImage(gray: np.ndarray,
+                   scale: float | None = None) -> List[RecognizedWord]:
+    """
+    Recognize the words in a grayscale image, in reading order.
+    scale is the glyph size relative to the editor's, estimated if None
+    """
+    ink = inkCoverage(gray)
+    mask = ink >= 0.5
+    thick = _strokeWidth(mask)
+    lines = findWordLines(mask, thick)
+    if scale is None:
+        scale = estimateScale(mask, lines, thick)
+        if scale is None:
+            return []
+        scale = refineScale(lines, scale, thick)
+
+    glyphW = GLYPH_TOTAL_X * scale
+    origins = []
+    counts = []
+    for line in lines:
+        top = line.y - WORD_LINE_Y * scale
+        for x0, x1 in line.words:
+            n = max(1, round((x1 - x0) / glyphW))
+            left = (x0 + x1) / 2 - n * glyphW / 2
+            origins.extend((left + i * glyphW, top) for i in range(n))
+            counts.append(n)
+    if len(origins) == 0:
+        return []
+
+    # glyph, part, sample
+    points = (np.array(origins, dtype=np.float32)[:, None, None, :] +
+              _SAMPLE_POINTS[None] * scale)
+    height, width = ink.shape
+    xs = np.clip(points[..., 0].astype(np.int32), 0, width - 1)
+    ys = np.clip(points[..., 1].astype(np.int32), 0, height - 1)
+    coverage = ink[ys, xs].mean(axis=2)
+    codes, confidence = decodeCoverage(coverage)
+
+    out: List[RecognizedWord] = []
+    pos = 0
+    for n in counts:
+        word = Word.fromCodes(codes[pos:pos + n].tolist())
+        out.append((word, tuple(confidence[pos:pos + n].tolist())))
+        pos += n
+    return out
+
+
+def recognizeFile(path: str,
+                  scale: float | None = None) -> List[RecognizedWord]:
+    return recognizeImage(loadImage(path), scale)
+
+
+# --- batch ---
+
+# (path, recognized words, error message or None)
+RecognizedFile = Tuple[str, List[RecognizedWord], str | None]
+
+# Per process DB connection, opened by _initWorker
+_db: WordDB | None = None
+
+
+def _initWorker(dbPath: str | None):
+    global _db
+    if dbPath is not None and os.path.exists(dbPath):
+        _db = WordDB(dbPath, readOnly=True)
+
+
+def _recognizeJob(job: Tuple[str, float | None]) -> RecognizedFile:
+    path, scale = job
+    try:
+        words = recognizeFile(path, scale)
+    except (OSError, ValueError) as err:
+        return path, [], str(err)
+    if _db is not None:
+        _db.resolveWords(word for word, _ in words)
+    return path, words, None
+
+
+def recognizeFiles(paths: Iterable[str],
+                   dbPath: str | None = DEFAULT_DB_PATH,
+                   workers: int = 1,
+                   scale: float | None = None) -> Iterator[RecognizedFile]:
+    """
+    Recognize each image and translate its words, in order.
+    With more than one worker, images are spread over a process pool
+    """
+    jobs = ((path, scale) for path in paths)
+    if workers <= 1:
+        _initWorker(dbPath)
+        yield from map(_recognizeJob, jobs)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers,
+                             initializer=_initWorker,
+                             initargs=(dbPath, )) as pool:
+        yield from orderedMap(pool, _recognizeJob, jobs, workers * 2)
+
+
+def writeText(out: TextIO, path: str, words: List[RecognizedWord]):
+    text = " ".join(word.value if len(word.value) > 0 else word.getSoundStr()
+                    for word, _ in words)
+    out.write(f"{path}: {text}\n")
+
+
+def writeJSONL(out: TextIO, path: str, words: List[RecognizedWord],
+               error: str | None):
+    entries = [{
+        "sounds": word.getSoundStr(),
+        "value": word.value if len(word.value) > 0 else None,
+        "confidence": [round(c, 3) for c in conf]
+    } for word, conf in words]
+    record = {"file": path, "words": entries}
+    if error is not None:
+        record["error"] = error
+    json.dump(record, out)
+    out.write("\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("inputs", nargs="+", help="image files")
+    parser.add_argument("-o",
+                        "--output",
+                        default="-",
+                        help="output file, defaults to stdout")
+    parser.add_argument("-f",
+                        "--format",
+                        choices=["text", "jsonl"],
+                        default="text")
+    parser.add_argument("--tdoc",
+                        help="also save each image's words as a document "
+                        "in this directory")
+    parser.add_argument("--scale",
+                        type=float,
+                        help="glyph size relative to the editor's, "
+                        "estimated per image by default")
+    parser.add_argument("--min-confidence",
+                        type=float,
+                        default=DEFAULT_MIN_CONFIDENCE,
+                        help="report glyphs below this confidence")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, help="word DB path")
+    parser.add_argument("-j",
+                        "--workers",
+                        type=int,
+                        default=os.cpu_count() or 1,
+                        help="number of worker processes")
+    args = parser.parse_args()
+
+    # migrate an old DB once here, workers only open it read only
+    try:
+        upgradeDB(args.db)
+    except (WordDBError, sqlite3.Error) as err:
+        print(f"{args.db}: {err}", file=sys.stderr)
+        sys.exit(1)
+
+    outFile = sys.stdout if args.output == "-" else open(
+        args.output, "w", encoding="utf-8")
+    if args.tdoc is not None:
+        os.makedirs(args.tdoc, exist_ok=True)
+
+    failed = 0
+    try:
+        for path, words, error in recognizeFiles(args.inputs, args.db,
+                                                 args.workers, args.scale):
+            if args.format == "jsonl":
+                writeJSONL(outFile, path, words, error)
+            elif error is None:
+                writeText(outFile, path, words)
+
+            if error is not None:
+                failed += 1
+                print(f"{path}: {error}", file=sys.stderr)
+                continue
+
+            uncertain = sum(c < args.min_confidence for _, conf in words
+                            for c in conf)
+            print(f"{path}: {len(words)} words, {uncertain} uncertain glyphs",
+                  file=sys.stderr)
+            if args.tdoc is not None:
+                name = os.path.splitext(os.path.basename(path))[0]
+                saveDocument(os.path.join(args.tdoc, name + DOC_EXT),
+                             [word for word, _ in words])
+    finally:
+        if outFile is not sys.stdout:
+            outFile.close()
+
+    if failed > 0:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
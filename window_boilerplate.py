@@ -15,15 +15,60 @@ def errorCallback(err: int, msg: str) -> None:
     print(f'GLFW Error Code: {err}, Msg: {msg}')
 
 
+class IdleConfig:
+    """
+    Settings for throttling the render loop while nothing is happening.
+    timeout: max seconds to block waiting for events while idle
+    activeFrames: number of frames to keep redrawing after the last event,
+        so hover states and key repeats settle
+    pending: optional callback, returns True while there is outstanding work
+        (e.g. a DB result) that needs frames to be drawn
+    """
+
+    def __init__(self,
+                 timeout: float = 0.5,
+                 activeFrames: int = 30,
+                 pending: Optional[Callable[[], bool]] = None) -> None:
+        self.timeout = timeout
+        self.activeFrames = activeFrames
+        self.pending = pending
+
+
+# keyboard keys checked for input while idling, without gamepad/mouse keys
+_KEYBOARD_KEYS = tuple({
+    k
+    for k in im.ImKey.__members__.values()
+    if int(im.ImKey.Tab) <= int(k) < int(im.ImKey.GamepadStart)
+})
+
+
+def _hadInput() -> bool:
+    """
+    True if ImGui saw any mouse or keyboard input this frame,
+    call after im.NewFrame()
+    """
+    io = im.GetIO()
+    if io.MouseDelta.x != 0 or io.MouseDelta.y != 0:
+        return True
+    if io.MouseWheel != 0 or io.MouseWheelH != 0:
+        return True
+    if any(io.MouseDown) or im.IsAnyItemActive():
+        return True
+    return any(im.IsKeyDown(k) for k in _KEYBOARD_KEYS)
+
+
 def window_mainloop(title: str,
                     draw: DrawFunc,
                     init: Optional[Callable[[], None]] = None,
-                    cleanup: Optional[Callable[[], None]] = None):
+                    cleanup: Optional[Callable[[], None]] = None,
+                    idle: Optional[IdleConfig] = None):
     """
     Create a single window and enter render loop until either the window is closed
     or the draw() func returns true.
     init is called once, after imgui is initialized.
     cleanup func is called once before imgui contexts are destroyed
+    If idle is given, the loop blocks on events instead of redrawing at vsync rate
+    once there has been no input for idle.activeFrames frames
     """
 
     # set error callback func
@@ -67,10 +112,30 @@ def window_mainloop(title: str,
         init()
 
     # 5) Main Loop
+    framesLeft = 0 if idle is None else idle.activeFrames
     while True:
         # pre-frame init
-        glfw.PollEvents()
+        if idle is None:
+            glfw.PollEvents()
+        elif framesLeft > 0 or (idle.pending is not None and idle.pending()):
+            glfw.PollEvents()
+            framesLeft -= 1
+        else:
+            start = glfw.GetTime()
+            glfw.WaitEventsTimeout(idle.timeout)
+            if glfw.WindowShouldClose(window):
+                break
+            # returning before the timeout means an event woke us up
+            if glfw.GetTime() - start < idle.timeout:
+                framesLeft = idle.activeFrames
+            elif idle.pending is None or not idle.pending():
+                # timed out with nothing to do, keep the last frame
+                continue
+
         im.NewFrame()
+        # polled events count as activity too, not just waking from a wait
+        if idle is not None and _hadInput():
+            framesLeft = idle.activeFrames
 
         # Do GUI processing
         shouldExit = draw()
@@ -0,0 +1,219 @@
+"""
+Gap buffer of words, the editor's document model
+"""
+from typing import Callable, Iterable, Iterator, List, Protocol, Tuple
+
+from glyphs import Word
+
+MIN_GAP = 64
+
+# (start, end, delta): words [start, end) are new or changed, and the
+# document grew by delta words. Words from end on are unchanged, shifted by delta
+ChangedRange = Tuple[int, int, int]
+
+
+class WordSource(Protocol):
+    """
+    Random access words that can be decoded lazily, e.g. a MappedDocument
+    """
+
+    def __len__(self) -> int:
+        ...
+
+    def __getitem__(self, idx: int) -> Word:
+        ...
+
+    def wordLength(self, idx: int) -> int:
+        ...
+
+
+class WordBuffer:
+    """
+    Sequence of words stored around a gap at the last edit position, so
+    inserting and removing near the cursor doesn't shift the whole document.
+    Changes are accumulated into a single range, see takeChanges().
+
+    A buffer can be backed by a WordSource, words are then only decoded
+    (and passed to resolve) the first time they are accessed.
+    Glyph edits happen inside a Word, call touch() after changing one
+    """
+
+    def __init__(self,
+                 words: Iterable[Word] = (),
+                 source: WordSource | None = None,
+                 resolve: Callable[[Word], None] | None = None) -> None:
+        """
+        source: lazily decoded words, used instead of words
+        resolve: called on each word decoded from source with no translation
+        """
+        # slots holding an int are source indices not decoded yet
+        items: List[Word | int | None]
+        if source is not None:
+            items = list(range(len(source)))
+        else:
+            items = list(words)
+        self._source = source
+        self._resolve = resolve
+
+        n = len(items)
+        self._buf = items + [None] * max(MIN_GAP, n // 4)
+        self._gapStart = n
+        self._gapEnd = len(self._buf)
+
+        # everything is new
+        self._changed: ChangedRange | None = (0, n, n)
+
+        # cursor
+        self.wordIdx = 0
+        self.glyphIdx = 0
+
+    def __len__(self) -> int:
+        return len(self._buf) - (self._gapEnd - self._gapStart)
+
+    def _phys(self, idx: int) -> int:
+        if idx < 0:
+            idx += len(self)
+        if idx < 0 or idx >= len(self):
+            raise IndexError("word index out of range")
+        if idx < self._gapStart:
+            return idx
+        return idx + self._gapEnd - self._gapStart
+
+    def _moveGap(self, idx: int):
+        buf = self._buf
+        gs = self._gapStart
+        ge = self._gapEnd
+        if idx < gs:
+            k = gs - idx
+            buf[ge - k:ge] = buf[idx:gs]
+            # clear the vacated slots, that weren't just written to
+            clear = min(gs, ge - k)
+            buf[idx:clear] = [None] * (clear - idx)
+            self._gapStart = idx
+            self._gapEnd = ge - k
+        elif idx > gs:
+            k = idx - gs
+            buf[gs:idx] = buf[ge:ge + k]
+            clear = max(idx, ge)
+            buf[clear:ge + k] = [None] * (ge + k - clear)
+            self._gapStart = idx
+            self._gapEnd = ge + k
+
+    def _markChanged(self, start: int, removed: int, inserted: int):
+        end = start + inserted
+        delta = inserted - removed
+        if self._changed is not None:
+            oldStart, oldEnd, oldDelta = self._changed
+            if oldEnd > start:
+                # the previous range's end moved with this edit
+                end = max(end, oldEnd + delta)
+            else:
+                end = max(end, oldEnd)
+            start = min(start, oldStart)
+            delta += oldDelta
+        self._changed = (start, end, delta)
+
+    def takeChanges(self) -> ChangedRange | None:
+        """
+        Get the range changed since the last call, None if nothing changed
+        """
+        out = self._changed
+        self._changed = None
+        return out
+
+    def touch(self, idx: int):
+        """
+        Mark a word as changed in place
+        """
+        self._markChanged(idx, 1, 1)
+
+    def __getitem__(self, idx: int) -> Word:
+        phys = self._phys(idx)
+        word = self._buf[phys]
+        if type(word) is int:
+            word = self._source[word]
+            if self._resolve is not None and len(word.value) == 0:
+                self._resolve(word)
+            self._buf[phys] = word
+        return word
+
+    def __setitem__(self, idx: int, word: Word):
+        self._buf[self._phys(idx)] = word
+        self._markChanged(idx if idx >= 0 else idx + len(self), 1, 1)
+
+    def __iter__(self) -> Iterator[Word]:
+        for idx in range(len(self)):
+            yield self[idx]
+
+    def wordLength(self, idx: int) -> int:
+        """
+        Number of glyphs in a word, without decoding it
+        """
+        word = self._buf[self._phys(idx)]
+        if type(word) is int:
+            return self._source.wordLength(word)
+        return len(word)
+
+    def insert(self, idx: int, word: Word):
+        size = len(self)
+        idx = max(0, min(idx if idx >= 0 else idx + size, size))
+        if self._gapStart == self._gapEnd:
+            grow = max(MIN_GAP, size // 2)
+            self._buf[self._gapStart:self._gapStart] = [None] * grow
+            self._gapEnd += grow
+        self._moveGap(idx)
+        self._buf[self._gapStart] = word
+        self._gapStart += 1
+        self._markChanged(idx, 0, 1)
+
+    def pop(self, idx: int = -1) -> Word:
+        if idx < 0:
+            idx += len(self)
+        word = self[idx]
+        self._moveGap(idx)
+        self._buf[self._gapEnd] = None
+        self._gapEnd += 1
+        self._markChanged(idx, 1, 0)
+        return word
+
+    def snapshot(self) -> List[Word]:
+        """
+        Every word, for saving. Words not decoded yet are read from the
+        source without being resolved or kept
+        """
+        out = []
+        for idx in range(len(self)):
+            word = self._buf[self._phys(idx)]
+            if type(word) is int:
+                word = self._source[word]
+            out.append(word)
+        return out
+
+    def detach(self):
+        """
+        Decode every remaining word, so the source can be closed
+        """
+        if self._source is None:
+            return
+        for idx in range(len(self)):
+            self[idx]
+        self._source = None
+
+    # Cursor
+
+    def selected(self) -> Word:
+        return self[self.wordIdx]
+
+    def moveRight(self):
+        if self.glyphIdx + 1 < self.wordLength(self.wordIdx):
+            self.glyphIdx += 1
+        elif self.wordIdx + 1 < len(self):
+            self.wordIdx += 1
+            self.glyphIdx = 0
+
+    def moveLeft(self):
+        if self.glyphIdx > 0:
+            self.glyphIdx -= 1
+        elif self.wordIdx > 0:
+            self.wordIdx -= 1
+            self.glyphIdx = self.wordLength(self.wordIdx) - 1
@@ -1,58 +1,540 @@
 import os
+import pathlib
 import sqlite3
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Iterator, List, Sequence, Tuple
 
-from glyphs import Word, wordFromStr
+from glyphs import (Word, codesFromKey, codesFromStr, keyFromCodes,
+                    SoundStrError)
+from word_index import PrefixIndex, foldValue
+from pattern_index import GlyphPattern, PatternIndex
 
-SCHEMA = """
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(__file__), "words.db")
+
+# stored in PRAGMA user_version, 0 is the original sound string schema
+SCHEMA_VERSION = 2
+
+# key is the word's glyph codes packed by keyFromCodes(),
+# norm is the value folded by foldValue() for case-insensitive lookups
+CREATE_WORDS = """
 CREATE TABLE IF NOT EXISTS words
 (
-    sounds UNIQUE NOT NULL, 
-    value NOT NULL
-)
+    key BLOB PRIMARY KEY NOT NULL,
+    value TEXT NOT NULL,
+    norm TEXT NOT NULL
+) WITHOUT ROWID
 """
+CREATE_WORDS_NORM = "CREATE INDEX IF NOT EXISTS words_norm ON words (norm)"
+
+GET_WORD = "SELECT value FROM words WHERE key = ?"
+STORE_WORD = "INSERT INTO words VALUES (:key, :value, :norm) ON CONFLICT DO UPDATE SET value = :value, norm = :norm"
+REM_WORD = "DELETE FROM words WHERE key = ?"
+LOOKUP_WORD = "SELECT key, value FROM words WHERE norm = ?"
+# ?1 is the folded prefix, ?2 is it followed by the max code point
+SEARCH_PREFIX = """
+SELECT value, key FROM words
+WHERE norm >= ?1 AND norm < ?2
+ORDER BY norm
+LIMIT ?3
+"""
+
+# ? is replaced by a placeholder per key
+GET_WORDS = "SELECT key, value FROM words WHERE key IN ({})"
+# bound parameters per query, below SQLite's lowest default limit.
+# Used when the connection's limit can't be read
+MAX_QUERY_PARAMS = 900
+
+# VM instructions between checks for a cancelled query
+CANCEL_CHECK_STEPS = 1000
+ALL_WORDS = "SELECT key, value FROM words"
+ALL_KEYS = "SELECT key FROM words"
+
+# version 0 -> 2, the old table is renamed while it's copied
+V0_RENAME = "ALTER TABLE words RENAME TO words_v0"
+V0_ROWS = "SELECT sounds, value FROM words_v0"
+V0_INSERT = "INSERT INTO words VALUES (?, ?, ?) ON CONFLICT DO NOTHING"
+# rows whose sound string doesn't parse are kept here rather than lost
+V0_UNPARSED = "CREATE TABLE words_unparsed (sounds, value)"
+
+
+class WordDBError(Exception):
+    pass
 
-GET_WORD = "SELECT value FROM words WHERE sounds = ?"
-STORE_WORD = "INSERT INTO words VALUES (:sounds, :value) ON CONFLICT DO UPDATE SET value = :value"
-REM_WORD = "DELETE FROM words WHERE sounds = ?"
-LOOKUP_WORD = "SELECT sounds FROM words WHERE value = ?"
+
+def upgradeDB(path: str):
+    """
+    Migrate the DB at path to the current schema if it needs it, so it can
+    be opened read only afterwards. Does nothing if there is no DB
+    """
+    if not os.path.exists(path):
+        return
+    try:
+        WordDB(path, readOnly=True).close()
+    except WordDBError:
+        # raises again if the schema is newer rather than older
+        WordDB(path, flushDelay=None).close()
 
 
 class WordDB:
+    """
+    Schema:
+    Words are keyed on their packed glyph codes (Word.getKey()), translations
+    are stored with a case folded copy for lookups. Opening a DB from before
+    the schema was versioned migrates it in place, which needs write access.
+
+    Durability:
+    With a flushDelay, storeWord() only queues the write. Queued writes are
+    visible to reads on this WordDB immediately, but are not on disk until
+    flush() is called, either explicitly, by tick() once the delay has passed,
+    or by close(). Writes are committed in a single transaction per flush.
+    The DB runs in WAL mode, with synchronous=NORMAL a crash can lose the last
+    committed flush but never corrupts the file. Use synchronous="FULL"
+    to make every flush durable once it returns.
+
+    Caching:
+    getWord() results are kept in an LRU cache of cacheSize entries keyed on
+    the word key, including misses. preload() loads the whole table into
+    the cache, after which getWord() never queries SQLite.
+    storeWord() keeps the cache up to date.
+    resolveWords() translates a whole document with one query per
+    maxQueryParams distinct words.
+
+    Lookups:
+    lookupWord() and searchPrefix() match translations ignoring case, using
+    the words_norm index. Once preloaded they are answered from an in-memory
+    PrefixIndex instead.
+
+    searchPattern() answers partial glyph queries from a PatternIndex,
+    built on first use and kept up to date by storeWord().
+    """
 
-    def __init__(self) -> None:
-        self.con = sqlite3.connect(
-            os.path.join(os.path.dirname(__file__), "words.db"))
+    def __init__(self,
+                 path: str = DEFAULT_DB_PATH,
+                 flushDelay: float | None = 1.0,
+                 synchronous: str = "NORMAL",
+                 cacheSize: int = 4096,
+                 preload: bool = False,
+                 readOnly: bool = False) -> None:
+        """
+        flushDelay: max seconds a write is held before being committed,
+            None commits on every storeWord()
+        cacheSize: max entries in the read cache, ignored once preloaded
+        preload: load the whole dictionary into the cache
+        readOnly: open an existing DB without write access,
+            any storeWord() will fail on flush
+        """
+        self.readOnly = readOnly
+        if readOnly:
+            uri = pathlib.Path(os.path.abspath(path)).as_uri()
+            self.con = sqlite3.connect(f"{uri}?mode=ro", uri=True)
+        else:
+            self.con = sqlite3.connect(path)
         self.cur = self.con.cursor()
         #self.con.set_trace_callback(print)
+        # Connection.getlimit() is new in 3.11
+        if hasattr(self.con, "getlimit"):
+            self.maxQueryParams = self.con.getlimit(
+                sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER)
+        else:
+            self.maxQueryParams = MAX_QUERY_PARAMS
 
-        self.cur.execute(SCHEMA)
+        if not readOnly:
+            self.cur.execute("PRAGMA journal_mode=WAL")
+            self.cur.execute(f"PRAGMA synchronous={synchronous}")
+        self._checkSchema()
 
-    def storeWord(self, word: Word):
-        if len(word.value) == 0:
-            self.cur.execute(REM_WORD, (word.getSoundStr(), ))
-        else:
-            soundStr = word.getSoundStr()
-            value = word.value.copy()
-            self.cur.execute(STORE_WORD, {"sounds": soundStr, "value": value})
+        self.flushDelay = flushDelay
+        # key -> value, empty value means delete
+        self._pending: Dict[bytes, str] = {}
+        self._flushAt: float | None = None
 
+        # key -> value, empty value is a known miss
+        self._cache: OrderedDict[bytes, str] = OrderedDict()
+        self.cacheSize = cacheSize
+        # True when the cache holds every word, so a miss means not in the DB
+        self._cacheComplete = False
+        self.cacheHits = 0
+        self.cacheMisses = 0
+
+        # only built when preloaded
+        self._valueIndex: PrefixIndex | None = None
+        # built on first pattern search
+        self._patternIndex: PatternIndex | None = None
+
+        if preload:
+            self.preload()
+
+    def __enter__(self) -> 'WordDB':
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """
+        Flush any pending writes and close the connection
+        """
+        self.flush()
+        self.con.close()
+
+    def _checkSchema(self):
+        version = self.cur.execute("PRAGMA user_version").fetchone()[0]
+        if version == SCHEMA_VERSION:
+            return
+        if version > SCHEMA_VERSION:
+            raise WordDBError(
+                f"Word DB schema version {version} is newer than this "
+                f"version of the translator ({SCHEMA_VERSION})")
+        if self.readOnly:
+            raise WordDBError(
+                "Word DB needs upgrading, open it with write access once")
+
+        columns = [
+            row[1] for row in self.cur.execute("PRAGMA table_info(words)")
+        ]
+        # one transaction, so an interrupted migration leaves the old table
+        self.cur.execute("BEGIN")
+        try:
+            if len(columns) > 0:
+                self.cur.execute(V0_RENAME)
+            self.cur.execute(CREATE_WORDS)
+            self.cur.execute(CREATE_WORDS_NORM)
+            if len(columns) > 0:
+                self._migrateV0()
+            self.cur.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+        except BaseException:
+            self.con.rollback()
+            raise
         self.con.commit()
+        if len(columns) > 0:
+            # reclaim the space of the old table and its index
+            self.cur.execute("VACUUM")
+
+    def _migrateV0(self):
+        """
+        Copy the sound string keyed table into the new one.
+        Sound strings that decode to the same glyphs keep the first value
+        """
+        rows = []
+        unparsed = []
+        for sounds, value in self.con.execute(V0_ROWS):
+            try:
+                key = keyFromCodes(codesFromStr(str(sounds).strip()))
+            except SoundStrError:
+                unparsed.append((sounds, value))
+                continue
+            value = str(value)
+            rows.append((key, value, foldValue(value)))
+        self.cur.executemany(V0_INSERT, rows)
+
+        self.cur.execute("DROP TABLE words_v0")
+        if len(unparsed) > 0:
+            self.cur.execute(V0_UNPARSED)
+            self.cur.executemany("INSERT INTO words_unparsed VALUES (?, ?)",
+                                 unparsed)
+
+    def preload(self):
+        """
+        Load the whole dictionary into the read cache
+        """
+        cache: OrderedDict[bytes, str] = OrderedDict(
+            self.cur.execute(ALL_WORDS))
+        for key, value in self._pending.items():
+            if len(value) == 0:
+                cache.pop(key, None)
+            else:
+                cache[key] = value
+
+        self._cache = cache
+        self._cacheComplete = True
+        self._valueIndex = PrefixIndex(cache.items())
+
+    def cacheStats(self) -> Dict[str, int]:
+        return {
+            "hits": self.cacheHits,
+            "misses": self.cacheMisses,
+            "size": len(self._cache),
+        }
+
+    def _cacheGet(self, key: bytes) -> str | None:
+        try:
+            value = self._cache[key]
+        except KeyError:
+            if self._cacheComplete:
+                self.cacheHits += 1
+                return ""
+            self.cacheMisses += 1
+            return None
+
+        self.cacheHits += 1
+        if not self._cacheComplete:
+            self._cache.move_to_end(key)
+        return value
+
+    def _cachePut(self, key: bytes, value: str):
+        if self._cacheComplete:
+            if len(value) == 0:
+                self._cache.pop(key, None)
+            else:
+                self._cache[key] = value
+            return
+
+        self._cache[key] = value
+        self._cache.move_to_end(key)
+        if len(self._cache) > self.cacheSize:
+            self._cache.popitem(last=False)
+
+    def hasPendingWrites(self) -> bool:
+        return len(self._pending) > 0
+
+    def flush(self):
+        """
+        Commit all pending writes in one transaction
+        """
+        if len(self._pending) == 0:
+            return
+
+        stores = []
+        removes = []
+        for key, value in self._pending.items():
+            if len(value) == 0:
+                removes.append((key, ))
+            else:
+                stores.append({
+                    "key": key,
+                    "value": value,
+                    "norm": foldValue(value)
+                })
+
+        with self.con:
+            self.cur.executemany(REM_WORD, removes)
+            self.cur.executemany(STORE_WORD, stores)
+
+        self._pending.clear()
+        self._flushAt = None
+
+    def tick(self):
+        """
+        Call periodically (e.g. once per frame) to flush writes once their delay has passed
+        """
+        if self._flushAt is not None and time.monotonic() >= self._flushAt:
+            self.flush()
+
+    def _indexPut(self, key: bytes, value: str, codes: Sequence[int]):
+        """
+        Update the cache and indexes for a new value, empty if deleted
+        """
+        if self._valueIndex is not None:
+            # the cache is complete, so it has the old value
+            oldValue = self._cache.get(key)
+            if oldValue is not None:
+                self._valueIndex.remove(key, oldValue)
+            if len(value) > 0:
+                self._valueIndex.add(key, value)
+
+        if self._patternIndex is not None:
+            if len(value) > 0:
+                self._patternIndex.add(key, codes)
+            else:
+                self._patternIndex.remove(key)
+
+        self._cachePut(key, value)
+
+    def storeWord(self, word: Word):
+        key = word.getKey()
+        self._indexPut(key, word.value, word.codes)
+        self._pending[key] = word.value
+
+        if self.flushDelay is None:
+            self.flush()
+        elif self._flushAt is None:
+            self._flushAt = time.monotonic() + self.flushDelay
+
+    def storeWords(self, words: Iterable[Word]):
+        """
+        Store many translations in one transaction, replacing existing ones.
+        Values must not be empty. Pending writes are committed first
+        """
+        self.flush()
+        rows = []
+        for word in words:
+            key = word.getKey()
+            self._indexPut(key, word.value, word.codes)
+            rows.append({
+                "key": key,
+                "value": word.value,
+                "norm": foldValue(word.value)
+            })
+        with self.con:
+            self.cur.executemany(STORE_WORD, rows)
+
+    def getValues(self, keys: Sequence[bytes]) -> Dict[bytes, str]:
+        """
+        Get the translations of many distinct keys with a few queries,
+        keys without one are left out. Results are cached like getValue()
+        """
+        out: Dict[bytes, str] = {}
+        query: List[bytes] = []
+        for key in keys:
+            value = self._pending.get(key)
+            if value is None:
+                value = self._cacheGet(key)
+            if value is None:
+                query.append(key)
+            elif len(value) > 0:
+                out[key] = value
+
+        for start in range(0, len(query), self.maxQueryParams):
+            chunk = query[start:start + self.maxQueryParams]
+            sql = GET_WORDS.format(",".join("?" * len(chunk)))
+            found = dict(self.con.execute(sql, chunk))
+            for key in chunk:
+                self._cachePut(key, found.get(key, ""))
+            out.update(found)
+        return out
+
+    def resolveWords(self, words: Iterable[Word]) -> List[bytes]:
+        """
+        Set the translation of every word, each distinct key is looked up once
+        with getValues(). Returns the keys that have no translation
+        """
+        byKey: Dict[bytes, List[Word]] = {}
+        for word in words:
+            byKey.setdefault(word.getKey(), []).append(word)
+
+        values = self.getValues(list(byKey))
+        unknown = []
+        for key, same in byKey.items():
+            value = values.get(key, "")
+            if len(value) == 0:
+                unknown.append(key)
+            for word in same:
+                word.value = value
+        return unknown
+
+    def iterWords(self) -> Iterator[Tuple[bytes, str]]:
+        """
+        Stream every stored (key, value) pair, including pending writes
+        """
+        self.flush()
+        # own cursor, so other queries can run while this is consumed
+        yield from self.con.execute(ALL_WORDS)
 
     def getWord(self, word: Word):
-        soundStr = word.getSoundStr()
-        res = self.cur.execute(GET_WORD, (soundStr, ))
-        value = res.fetchone()
-        if value is not None:
-            word.value.set(value[0])
-        else:
-            word.value.set("")
+        word.value = self.getValue(word.getKey())
 
-    def lookupWord(self, text: str) -> Word | None:
-        res = self.cur.execute(LOOKUP_WORD, (text, ))
-        value = res.fetchone()
+    def getValue(self, key: bytes) -> str:
+        """
+        Get the translation of a word key, empty if there is none
+        """
+        value = self._cacheGet(key)
         if value is None:
+            # pending writes may have been evicted from the cache
+            value = self._pending.get(key)
+            if value is None:
+                res = self.cur.execute(GET_WORD, (key, ))
+                row = res.fetchone()
+                value = row[0] if row is not None else ""
+            self._cachePut(key, value)
+
+        return value
+
+    def lookupWord(self, text: str) -> Word | None:
+        """
+        Find the word translated as text, ignoring case
+        """
+        if self._valueIndex is not None:
+            match = self._valueIndex.find(text)
+        else:
+            match = None
+            folded = foldValue(text)
+            for key, value in self._pending.items():
+                if foldValue(value) == folded:
+                    match = value, key
+                    break
+
+            if match is None:
+                res = self.cur.execute(LOOKUP_WORD, (folded, ))
+                for key, value in res:
+                    # skip rows that have a pending change
+                    if key not in self._pending:
+                        match = value, key
+                        break
+
+        if match is None:
             return None
 
-        word = wordFromStr(value[0])
-        word.value.set(text)
+        value, key = match
+        return Word.fromKey(key, value)
+
+    def searchPrefix(
+        self,
+        prefix: str,
+        limit: int = 10,
+        cancelled: Callable[[], bool] | None = None
+    ) -> List[Tuple[str, bytes]] | None:
+        """
+        Get up to limit (value, key) pairs whose value starts with prefix,
+        ignoring case. If cancelled is given, it is polled while the query runs
+        and None is returned once it returns True
+        """
+        if self._valueIndex is not None:
+            return self._valueIndex.search(prefix, limit)
+        if cancelled is not None and cancelled():
+            return None
+
+        folded = foldValue(prefix)
+        out = []
+        for key, value in self._pending.items():
+            if len(value) > 0 and foldValue(value).startswith(folded):
+                out.append((value, key))
+
+        if cancelled is not None:
+            self.con.set_progress_handler(cancelled, CANCEL_CHECK_STEPS)
+        try:
+            res = self.cur.execute(SEARCH_PREFIX,
+                                   (folded, folded + "\U0010ffff", limit))
+            for value, key in res:
+                if key not in self._pending:
+                    out.append((value, key))
+        except sqlite3.OperationalError:
+            # progress handler returning True interrupts the query
+            if cancelled is not None and cancelled():
+                return None
+            raise
+        finally:
+            if cancelled is not None:
+                self.con.set_progress_handler(None, 0)
+
+        out.sort(key=lambda x: foldValue(x[0]))
+        return out[:limit]
+
+    def _buildPatternIndex(self) -> PatternIndex:
+        if self._cacheComplete:
+            keys = list(self._cache.keys())
+        else:
+            keys = {row[0] for row in self.cur.execute(ALL_KEYS)}
+            for key, value in self._pending.items():
+                if len(value) > 0:
+                    keys.add(key)
+                else:
+                    keys.discard(key)
+
+        return PatternIndex((k, codesFromKey(k)) for k in keys)
+
+    def searchPattern(self,
+                      pattern: List[GlyphPattern],
+                      limit: int = 100,
+                      prefix: bool = False) -> List[Tuple[str, bytes]]:
+        """
+        Get up to limit (value, key) pairs for the stored words matching
+        a per glyph pattern. If prefix is set, longer words are matched on their
+        first glyphs
+        """
+        if self._patternIndex is None:
+            self._patternIndex = self._buildPatternIndex()
 
-        return word
+        keys = self._patternIndex.query(pattern, limit, prefix)
+        values = self.getValues(keys)
+        return [(values.get(key, ""), key) for key in keys]
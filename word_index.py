@@ -0,0 +1,63 @@
+from bisect import bisect_left, insort
+from typing import Iterable, List, Tuple
+
+
+def foldValue(value: str) -> str:
+    """
+    Normalize a translation for case-insensitive matching
+    """
+    return value.casefold()
+
+
+class PrefixIndex:
+    """
+    Sorted in-memory index of translations, for exact and prefix lookups
+    without touching the DB.
+    Entries are (folded value, value, word key)
+    """
+
+    def __init__(self, words: Iterable[Tuple[bytes, str]] = ()) -> None:
+        """
+        words: (word key, value) pairs
+        """
+        self._entries: List[Tuple[str, str, bytes]] = sorted(
+            (foldValue(value), value, key) for key, value in words)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, key: bytes, value: str):
+        insort(self._entries, (foldValue(value), value, key))
+
+    def remove(self, key: bytes, value: str):
+        entry = (foldValue(value), value, key)
+        idx = bisect_left(self._entries, entry)
+        if idx < len(self._entries) and self._entries[idx] == entry:
+            del self._entries[idx]
+
+    def search(self, prefix: str, limit: int) -> List[Tuple[str, bytes]]:
+        """
+        Get up to limit (value, word key) pairs whose value starts with prefix,
+        in sorted order
+        """
+        folded = foldValue(prefix)
+        out = []
+        idx = bisect_left(self._entries, (folded, ))
+        while idx < len(self._entries) and len(out) < limit:
+            entryFolded, value, key = self._entries[idx]
+            if not entryFolded.startswith(folded):
+                break
+            out.append((value, key))
+            idx += 1
+        return out
+
+    def find(self, text: str) -> Tuple[str, bytes] | None:
+        """
+        Get the first (value, word key) whose value matches text, ignoring case
+        """
+        folded = foldValue(text)
+        idx = bisect_left(self._entries, (folded, ))
+        if idx < len(self._entries) and self._entries[idx][0] == folded:
+            _, value, key = self._entries[idx]
+            return value, key
+        return None